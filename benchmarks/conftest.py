@@ -0,0 +1,149 @@
+"""Seed a benchmark database with production-like volumes of raffles.
+
+The database is only seeded again when its number of raffles does not match
+the configured volume, so repeated runs skip straight to the measurements.
+Volumes and repetitions are configured with `BENCHMARK_*` environment
+variables, see the project `README.md` file.
+"""
+import json
+import os
+from pathlib import Path
+
+import psycopg
+import pytest
+
+from raffle import db
+from raffle.config import Settings, load_settings
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+RAFFLES = int(os.environ.get("BENCHMARK_RAFFLES", 10_000))
+TICKETS = int(os.environ.get("BENCHMARK_TICKETS", 200))
+PRIZES = int(os.environ.get("BENCHMARK_PRIZES", 3))
+
+SEED_STATEMENTS = [
+    # A third of the raffles are drawn, a third sold out and the rest half full
+    """
+    insert into raffles
+      (name, total_tickets, available_tickets, winners_drawn, created_at)
+    select
+      'raffle ' || i,
+      %(tickets)s,
+      case mod(i, 3) when 2 then %(tickets)s / 2 else 0 end,
+      mod(i, 3) = 0,
+      now() - make_interval(secs => i)
+    from
+      generate_series(1, %(raffles)s) as i
+    """,
+    """
+    insert into prizes (raffle_id, name, amount)
+    select raffle_id, 'prize', %(prizes)s from raffles
+    """,
+    """
+    insert into tickets (raffle_id, ticket_number)
+    select raffle_id, ticket_number
+    from raffles, generate_series(1, total_tickets) as ticket_number
+    """,
+    # Hashing a single verification code keeps seeding cheap
+    """
+    insert into participants (raffle_id, ticket_number, ip_address, verification_code)
+    select raffle_id, ticket_number, '10.0.0.0'::inet + ticket_number, hash
+    from
+      raffles,
+      generate_series(1, total_tickets - available_tickets) as ticket_number,
+      (select crypt('BENCHMARK', gen_salt('md5')) as hash) as verification_code
+    """,
+    """
+    insert into winners (raffle_id, ticket_number, prize_id)
+    select raffle_id, ticket_number, prize_id
+    from
+      raffles
+      join prizes using (raffle_id),
+      generate_series(1, amount) as ticket_number
+    where winners_drawn
+    """,
+    """
+    insert into claim_rollups (raffle_id, bucket, claims)
+    select raffle_id, date_trunc('minute', claimed_at), count(*)
+    from participants
+    group by 1, 2
+    """,
+    "analyze",
+]
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-baseline",
+        action="store_true",
+        help="Record the measured latencies and plans as the new baseline",
+    )
+
+
+@pytest.fixture(scope="session")
+def bench_settings() -> Settings:
+    return load_settings(
+        PGDATABASE=os.environ.get("BENCHMARK_DATABASE", "benchmark"),
+        verification_code_crypt_algorithm="md5",
+    )
+
+
+@pytest.fixture(scope="session")
+def bench_conn(bench_settings) -> psycopg.Connection:
+    """Connect to the benchmark database, creating and seeding it if needed."""
+    with db.create_connection(load_settings()) as conn:
+        try:
+            conn.execute(f"create database {bench_settings.db_database};")
+        except psycopg.errors.DuplicateDatabase:
+            pass
+
+    with db.create_connection(bench_settings) as conn:
+        try:
+            seeded = conn.execute("select count(*) from raffles").fetchone()[0]
+        except psycopg.errors.UndefinedTable:
+            seeded = None
+
+        if seeded != RAFFLES:
+            db.migrations.delete_schema(conn)
+            db.configure_partitions(conn, bench_settings)
+            db.migrations.create_schema(conn)
+
+            params = {"raffles": RAFFLES, "tickets": TICKETS, "prizes": PRIZES}
+
+            for statement in SEED_STATEMENTS:
+                conn.execute(statement, params if "%(" in statement else None)
+
+        yield conn
+
+
+@pytest.fixture(scope="session")
+def samples(bench_conn) -> dict:
+    """Pick a representative raffle in each state from the seeded data."""
+    conditions = {
+        "partial": "0 < available_tickets",
+        "sold_out": "available_tickets = 0 and not winners_drawn",
+        "drawn": "winners_drawn",
+    }
+
+    return {
+        name: bench_conn.execute(
+            "select raffle_id, total_tickets, available_tickets, prize_id"
+            " from raffles join prizes using (raffle_id)"
+            f" where {condition} order by created_at desc limit 1"
+        ).fetchone()
+        for name, condition in conditions.items()
+    }
+
+
+@pytest.fixture(scope="session")
+def baseline(request) -> dict:
+    """Load the stored baseline and write the new one at the end if requested."""
+    stored = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    measured = {}
+
+    yield {"stored": stored, "measured": measured}
+
+    if request.config.getoption("--update-baseline") and measured:
+        BASELINE_PATH.write_text(
+            json.dumps({**stored, **measured}, indent=2, sort_keys=True) + "\n"
+        )
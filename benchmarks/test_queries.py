@@ -0,0 +1,269 @@
+"""Time every named query and record its plan against the seeded database.
+
+Each query runs in a transaction that is always rolled back, so write queries
+can be measured repeatedly without changing the seeded data. A query fails if
+its plan shape differs from the baseline or its median latency has regressed
+by more than the allowed tolerance.
+"""
+import inspect
+import os
+import re
+import statistics
+import time
+import uuid
+
+import psycopg
+import pytest
+from aiosql.types import SQLOperationType
+
+from raffle import db
+
+REPEAT = int(os.environ.get("BENCHMARK_REPEAT", 20))
+
+# Relative slowdown allowed before a query counts as regressed
+TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", 0.5))
+
+# Absolute slowdown in milliseconds ignored as noise for very fast queries
+NOISE_MS = float(os.environ.get("BENCHMARK_NOISE_MS", 1.0))
+
+
+# Number of tickets in raffles created while benchmarking
+NEW_TICKETS = 100
+
+
+def create_tickets_case(conn, samples) -> dict:
+    raffle_id = uuid.uuid4()
+    db.queries.create_raffle(
+        conn,
+        raffle_id=raffle_id,
+        name="raffle",
+        total_tickets=NEW_TICKETS,
+        opens_at=None,
+        waiting_room=False,
+    )
+    return {"raffle_id": raffle_id, "total_tickets": NEW_TICKETS}
+
+
+def fetch_queue_entry_case(conn, samples) -> dict:
+    raffle_id = samples["partial"].raffle_id
+    db.queries.join_queue(conn, raffle_id=raffle_id, ip_address="192.0.2.1")
+    return {"raffle_id": raffle_id, "ip_address": "192.0.2.1", "window": 100}
+
+
+def delete_participants_case(conn, samples) -> dict:
+    raffle_id = samples["drawn"].raffle_id
+    db.queries.delete_winners(conn, raffle_id=raffle_id)
+    return {"raffle_id": raffle_id}
+
+
+def delete_tickets_case(conn, samples) -> dict:
+    raffle_id = samples["drawn"].raffle_id
+    db.queries.delete_winners(conn, raffle_id=raffle_id)
+    db.queries.delete_participants(conn, raffle_id=raffle_id)
+    return {"raffle_id": raffle_id}
+
+
+# Parameters for each named query, built inside the rolled back transaction so
+# that any rows a query depends on may be set up first
+CASES = {
+    "archive_participants": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+    },
+    "archive_raffle": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+    },
+    "assign_winners": lambda conn, samples: {
+        "raffle_id": samples["sold_out"].raffle_id,
+        "ticket_number": 1,
+        "prize_id": samples["sold_out"].prize_id,
+    },
+    "claim_ticket": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+        "ticket_number": samples["partial"].total_tickets,
+        "ip_address": "192.0.2.1",
+        "verification_code": "BENCHMARK",
+        "crypt_algorithm": "md5",
+    },
+    "close_raffle": lambda conn, samples: {
+        "raffle_id": samples["sold_out"].raffle_id,
+    },
+    "create_draw_job": lambda conn, samples: {
+        "raffle_id": samples["sold_out"].raffle_id,
+    },
+    "create_prizes": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+        "name": "prize",
+        "amount": 1,
+    },
+    "create_raffle": lambda conn, samples: {
+        "raffle_id": uuid.uuid4(),
+        "name": "raffle",
+        "total_tickets": NEW_TICKETS,
+        "opens_at": None,
+        "waiting_room": False,
+    },
+    "create_tickets": create_tickets_case,
+    "delete_participants": delete_participants_case,
+    "delete_queue_entries": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+    },
+    "delete_tickets": delete_tickets_case,
+    "delete_winners": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+    },
+    "export_participants": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+    },
+    "fetch_draw_job": lambda conn, samples: {
+        "raffle_id": samples["sold_out"].raffle_id,
+    },
+    "fetch_prize": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+        "ticket_number": 1,
+    },
+    "fetch_queue_entry": fetch_queue_entry_case,
+    "fetch_raffle_analytics": lambda conn, samples: {
+        "raffle_id": samples["sold_out"].raffle_id,
+    },
+    "fetch_raffle": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+    },
+    "fetch_ticket_pool": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+        "limit": 10,
+    },
+    "fetch_ticket_with_validity": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+        "ticket_number": 1,
+        "verification_code": "BENCHMARK",
+    },
+    "fetch_winner": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+        "ticket_number": 1,
+    },
+    "finish_draw_job": lambda conn, samples: {
+        "raffle_id": samples["sold_out"].raffle_id,
+        "status": "done",
+        "error": None,
+    },
+    "has_ip_address_participated": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+        "ip_address": "10.0.0.1",
+    },
+    "join_queue": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+        "ip_address": "192.0.2.1",
+    },
+    "list_claim_rollups": lambda conn, samples: {
+        "raffle_id": samples["sold_out"].raffle_id,
+    },
+    "list_opening_raffles": lambda conn, samples: {
+        "lead": 60,
+    },
+    "list_participant_tickets": lambda conn, samples: {
+        "ip_address": "10.0.0.1",
+        "after_raffle": uuid.UUID(int=0),
+        "limit": 100,
+    },
+    "list_prizes": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+    },
+    "list_raffle_updates": lambda conn, samples: {
+        "raffle_ids": [samples["partial"].raffle_id, samples["sold_out"].raffle_id],
+    },
+    "list_raffles": lambda conn, samples: {
+        "limit": 10,
+    },
+    "list_winners": lambda conn, samples: {
+        "raffle_id": samples["drawn"].raffle_id,
+        "after_ticket": 0,
+        "limit": 100,
+    },
+    "lock_compactable_raffle": lambda conn, samples: {
+        "min_age": 0,
+    },
+    "lock_pending_draw_job": lambda conn, samples: {},
+    "prewarm_tickets": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+    },
+    "record_claim": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+    },
+    "release_ticket": lambda conn, samples: {
+        "raffle_id": samples["partial"].raffle_id,
+    },
+}
+
+QUERY_NAMES = sorted(
+    name for name in db.queries.available_queries if not name.endswith("_cursor")
+)
+
+
+def run_query(conn: psycopg.Connection, name: str, params: dict):
+    query = getattr(db.queries, name)
+
+    if query.operation == SQLOperationType.INSERT_UPDATE_DELETE_MANY:
+        return query(conn, [params])
+
+    result = query(conn, **params)
+
+    if inspect.isgenerator(result):
+        list(result)
+
+
+def plan_shape(plan: dict) -> list:
+    """Reduce a plan to its node types and relations, ignoring costs.
+
+    Partition suffixes are dropped so the shape does not depend on which
+    partition the sampled raffle happens to hash to.
+    """
+    relation = re.sub(r"_\d+$", "", plan.get("Relation Name", ""))
+
+    return [
+        plan["Node Type"],
+        relation,
+        [plan_shape(subplan) for subplan in plan.get("Plans", [])],
+    ]
+
+
+def test_every_query_has_a_case():
+    assert sorted(CASES) == QUERY_NAMES
+
+
+@pytest.mark.parametrize("name", QUERY_NAMES)
+def test_query(name, bench_conn, samples, baseline):
+    case = CASES[name]
+    timings = []
+
+    for _ in range(REPEAT):
+        with bench_conn.transaction(force_rollback=True):
+            params = case(bench_conn, samples)
+
+            if not timings:
+                cursor = psycopg.ClientCursor(bench_conn)
+                cursor.execute(
+                    f"explain (format json) {getattr(db.queries, name).sql}", params
+                )
+                (plan,) = cursor.fetchone()[0]
+
+            start = time.perf_counter()
+            run_query(bench_conn, name, params)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    measured = {
+        "median_ms": statistics.median(timings),
+        "plan": plan_shape(plan["Plan"]),
+    }
+    baseline["measured"][name] = measured
+    stored = baseline["stored"].get(name)
+
+    if stored is None:
+        pytest.skip("No baseline recorded, run with --update-baseline")
+
+    assert measured["plan"] == stored["plan"], "Query plan shape has changed"
+
+    allowed_ms = max(
+        stored["median_ms"] * (1 + TOLERANCE), stored["median_ms"] + NOISE_MS
+    )
+
+    assert measured["median_ms"] <= allowed_ms, "Query latency has regressed"
@@ -10,19 +10,94 @@ verification code.
 
 See the project `README.md` file for more details.
 """
+import asyncio
+import contextlib
+import datetime
+import functools
+import heapq
+import itertools
+import json
+import math
+import operator
 import random
 import uuid
+from typing import Callable, Literal, TypeVar
 
 import psycopg
 import pydantic
-from fastapi import Depends, FastAPI, HTTPException
-from tenacity import Retrying, retry_if_exception_type, stop_after_attempt
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from psycopg_pool import ConnectionPool, PoolTimeout, TooManyRequests
+from starlette.concurrency import run_in_threadpool
+from tenacity import (
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
+from raffle.cache import ReplayCache, SingleFlight, TTLCache
 from raffle.config import Settings
+from raffle.contention import ContentionTracker
+from raffle.deadlines import Deadline, DeadlineExceeded
+from raffle.events import RaffleEvents
+
+from . import compaction, db, deps, drawing, profiling, verification, warming
+
+T = TypeVar("T")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the optional background tasks for as long as the app is serving."""
+    # Resolve the settings the same way as the endpoints, so that overrides
+    # apply here too
+    get_settings = app.dependency_overrides.get(deps.get_settings, deps.get_settings)
+    settings = get_settings()
+    tasks = []
+
+    if settings.compact_interval:
+        tasks.extend(
+            asyncio.create_task(
+                compaction.compact_periodically(
+                    pool, settings.compact_interval, settings.compact_min_age
+                )
+            )
+            for pool in deps.get_bulkhead_pools(settings, "manager")
+        )
+
+    if settings.prewarm_lead:
+        tasks.extend(
+            asyncio.create_task(warming.warm_periodically(pool, settings.prewarm_lead))
+            for pool in deps.get_bulkhead_pools(settings, "claims")
+        )
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+app = FastAPI(title="Raffle API", description=__doc__, lifespan=lifespan)
+app.add_middleware(profiling.ProfilingMiddleware)
 
-from . import db, deps, verification
 
-app = FastAPI(title="Raffle API", description=__doc__)
+@app.exception_handler(DeadlineExceeded)
+@app.exception_handler(PoolTimeout)
+@app.exception_handler(TooManyRequests)
+@app.exception_handler(psycopg.errors.QueryCanceled)
+async def unavailable_handler(request: Request, exc: Exception) -> JSONResponse:
+    """Fail requests that cannot be served in time instead of piling them up."""
+    if isinstance(exc, DeadlineExceeded):
+        detail = str(exc)
+    elif isinstance(exc, TooManyRequests):
+        detail = "Server busy"
+    else:
+        detail = "Request timed out"
+
+    return JSONResponse({"detail": detail}, status_code=503)
 
 
 class CreatePrizeRequest(pydantic.BaseModel):
@@ -41,6 +116,11 @@ class CreateRaffleRequest(pydantic.BaseModel):
     total_tickets: pydantic.PositiveInt = pydantic.Field(
         json_schema_extra={"example": 100}
     )
+    opens_at: pydantic.AwareDatetime | None = pydantic.Field(
+        None,
+        json_schema_extra={"example": "2023-08-01T12:00:00Z"},
+    )
+    waiting_room: bool = pydantic.Field(False, json_schema_extra={"example": False})
     prizes: list[CreatePrizeRequest] = pydantic.Field(min_length=1)
 
 
@@ -67,15 +147,64 @@ class RaffleResponse(pydantic.BaseModel):
         json_schema_extra={"example": 50}
     )
     winners_drawn: bool = pydantic.Field(json_schema_extra={"example": False})
+    opens_at: datetime.datetime | None = pydantic.Field(
+        json_schema_extra={"example": "2023-08-01T12:00:00Z"}
+    )
+    waiting_room: bool = pydantic.Field(json_schema_extra={"example": False})
     prizes: list[PrizeResponse] = pydantic.Field(min_length=1)
 
 
+def _coalesced_read(
+    reads: SingleFlight,
+    key: tuple,
+    fetch: Callable[[Deadline], T],
+    deadline: Deadline,
+) -> T:
+    """Run a read shared by identical requests, waiting until the deadline.
+
+    The shared read is only limited in time, so that the first caller going
+    away does not fail the others waiting on it.
+    """
+    shared_deadline = Deadline(deadline.remaining())
+
+    try:
+        return reads.do(
+            key, functools.partial(fetch, shared_deadline), deadline.remaining()
+        )
+    except TimeoutError:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
 @app.get("/raffles/")
-def list_raffles(
-    conn: psycopg.Connection = Depends(deps.get_conn),
+async def list_raffles(
+    pools: tuple[ConnectionPool] = Depends(deps.get_pools),
+    reads: SingleFlight = Depends(deps.get_read_coalescer),
+    deadline: Deadline = Depends(deps.get_deadline),
 ) -> list[RaffleResponse]:
     """Return a list of the most recently created raffles and their prizes."""
-    rows = db.queries.list_raffles(conn, limit=10)
+
+    def fetch(pool: ConnectionPool, deadline: Deadline):
+        # Rows are read before the connection goes back to the pool, and
+        # coalesced callers each iterate over the same list
+        with db.connection(pool, deadline) as conn:
+            return list(db.queries.list_raffles(conn, limit=10))
+
+    # Each shard returns its own most recent raffles, so the overall most
+    # recent are among them
+    shards = await asyncio.gather(
+        *(
+            run_in_threadpool(
+                _coalesced_read,
+                reads,
+                ("list_raffles", shard),
+                functools.partial(fetch, pool),
+                deadline,
+            )
+            for shard, pool in enumerate(pools)
+        )
+    )
+    rows = heapq.merge(*shards, key=operator.attrgetter("created_at"), reverse=True)
+
     return [
         RaffleResponse(
             raffle_id=row.raffle_id,
@@ -83,12 +212,14 @@ def list_raffles(
             total_tickets=row.total_tickets,
             available_tickets=row.available_tickets,
             winners_drawn=row.winners_drawn,
+            opens_at=row.opens_at,
+            waiting_room=row.waiting_room,
             prizes=[
                 PrizeResponse(name=prize["name"], amount=prize["amount"])
                 for prize in row.prizes
             ],
         )
-        for row in rows
+        for row in itertools.islice(rows, 10)
     ]
 
 
@@ -107,39 +238,52 @@ def list_raffles(
 )
 def create_raffle(
     request: CreateRaffleRequest,
-    conn: psycopg.Connection = Depends(deps.get_conn),
+    pools: tuple[ConnectionPool] = Depends(deps.get_pools),
+    deadline: Deadline = Depends(deps.get_deadline),
 ) -> RaffleResponse:
     """Create a new raffle and allocate tickets and prizes.
 
+    Tickets can be claimed straight away, or from `opens_at` if it is given.
+    Raffles with a `waiting_room` only let participants claim once they are
+    admitted from the queue.
+
     Only requests from configured **manager** ip addresses will succeed.
     """
-    with conn.transaction():
-        row = db.queries.create_raffle(
+    raffle_id = uuid.uuid4()
+    pool = pools[db.shard_index(raffle_id, len(pools))]
+
+    with db.connection(pool, deadline) as conn, db.pipeline(conn):
+        db.queries.create_raffle(
             conn,
+            raffle_id=raffle_id,
             name=request.name,
             total_tickets=request.total_tickets,
+            opens_at=request.opens_at,
+            waiting_room=request.waiting_room,
         )
 
         db.queries.create_tickets(
             conn,
-            raffle_id=row.raffle_id,
+            raffle_id=raffle_id,
             total_tickets=request.total_tickets,
         )
 
         db.queries.create_prizes(
             conn,
             [
-                {"raffle_id": row.raffle_id, "name": prize.name, "amount": prize.amount}
+                {"raffle_id": raffle_id, "name": prize.name, "amount": prize.amount}
                 for prize in request.prizes
             ],
         )
 
     return RaffleResponse(
-        raffle_id=row.raffle_id,
-        name=row.name,
-        total_tickets=row.total_tickets,
-        available_tickets=row.available_tickets,
-        winners_drawn=row.winners_drawn,
+        raffle_id=raffle_id,
+        name=request.name,
+        total_tickets=request.total_tickets,
+        available_tickets=request.total_tickets,
+        winners_drawn=False,
+        opens_at=request.opens_at,
+        waiting_room=request.waiting_room,
         prizes=[
             PrizeResponse(name=prize.name, amount=prize.amount)
             for prize in request.prizes
@@ -161,10 +305,21 @@ def create_raffle(
 )
 def fetch_raffle(
     raffle_id: pydantic.UUID4,
-    conn: psycopg.Connection = Depends(deps.get_conn),
+    pool: ConnectionPool = Depends(deps.get_pool),
+    reads: SingleFlight = Depends(deps.get_read_coalescer),
+    deadline: Deadline = Depends(deps.get_deadline),
 ) -> RaffleResponse:
-    """Return an individual raffle details based on its identifier."""
-    row = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+    """Return an individual raffle details based on its identifier.
+
+    Identical requests arriving while one is already querying the database
+    wait for and share its result rather than taking a connection each.
+    """
+
+    def fetch(deadline: Deadline):
+        with db.connection(pool, deadline) as conn:
+            return db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+    row = _coalesced_read(reads, ("fetch_raffle", raffle_id), fetch, deadline)
 
     if row is None:
         raise HTTPException(404, "Raffle not found")
@@ -175,6 +330,8 @@ def fetch_raffle(
         total_tickets=row.total_tickets,
         available_tickets=row.available_tickets,
         winners_drawn=row.winners_drawn,
+        opens_at=row.opens_at,
+        waiting_room=row.waiting_room,
         prizes=[
             PrizeResponse(name=prize["name"], amount=prize["amount"])
             for prize in row.prizes
@@ -182,6 +339,103 @@ def fetch_raffle(
     )
 
 
+# Seconds between comments sent to keep idle event streams open
+KEEPALIVE_INTERVAL = 15
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get(
+    "/raffles/{raffle_id}/events/",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {
+                "text/event-stream": {
+                    "example": (
+                        'event: tickets\ndata: {"available_tickets": 50}\n\n'
+                        'event: tickets\ndata: {"available_tickets": 0}\n\n'
+                        "event: winners\ndata: {}\n\n"
+                    )
+                }
+            }
+        },
+        404: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Raffle not found"},
+                }
+            }
+        },
+    },
+)
+async def stream_raffle_events(
+    raffle_id: pydantic.UUID4,
+    pool: ConnectionPool = Depends(deps.get_pool),
+    events: RaffleEvents = Depends(deps.get_raffle_events),
+    settings: Settings = Depends(deps.get_settings),
+    deadline: Deadline = Depends(deps.get_deadline),
+) -> StreamingResponse:
+    """Stream the remaining tickets of a raffle as Server-Sent Events.
+
+    A `tickets` event is sent with the current number of available tickets and
+    again whenever it changes, at most once per configured interval. Once the
+    winners are drawn a final `winners` event is sent and the stream ends.
+    """
+
+    def fetch(deadline: Deadline):
+        with db.connection(pool, deadline) as conn:
+            return db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+    if await run_in_threadpool(fetch, deadline) is None:
+        raise HTTPException(404, "Raffle not found")
+
+    async def stream():
+        updates = events.subscribe(raffle_id)
+
+        try:
+            # Fetch again once updates are sure to reach us so none is missed
+            await events.ready()
+            # The response has started, so the stream itself watches for the
+            # client going away and this read is only limited in time
+            row = await run_in_threadpool(fetch, Deadline(settings.request_timeout))
+            update = {
+                "available_tickets": row.available_tickets,
+                "winners_drawn": row.winners_drawn,
+            }
+
+            while True:
+                yield format_event(
+                    "tickets", {"available_tickets": update["available_tickets"]}
+                )
+
+                if update["winners_drawn"]:
+                    yield format_event("winners", {})
+                    return
+
+                # Waiting here coalesces any updates made in the meantime
+                await asyncio.sleep(settings.events_interval)
+
+                while True:
+                    try:
+                        update = await asyncio.wait_for(
+                            updates.get(), timeout=KEEPALIVE_INTERVAL
+                        )
+                        break
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+        finally:
+            events.unsubscribe(raffle_id, updates)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 class ClaimTicketResponse(pydantic.BaseModel):
     ticket_number: pydantic.PositiveInt = pydantic.Field(
         json_schema_extra={"example": 5}
@@ -195,7 +449,16 @@ class ClaimTicketResponse(pydantic.BaseModel):
         403: {
             "content": {
                 "application/json": {
-                    "example": {"detail": "Already participated"},
+                    "examples": {
+                        "already_participated": {
+                            "summary": "Already participated",
+                            "value": {"detail": "Already participated"},
+                        },
+                        "not_in_queue": {
+                            "summary": "Not in queue",
+                            "value": {"detail": "Not in queue"},
+                        },
+                    }
                 }
             },
         },
@@ -213,6 +476,26 @@ class ClaimTicketResponse(pydantic.BaseModel):
                 }
             },
         },
+        425: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Raffle not open yet"},
+                }
+            },
+            "headers": {
+                "Retry-After": {
+                    "description": "Seconds until the raffle opens",
+                    "schema": {"type": "integer"},
+                }
+            },
+        },
+        429: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Not admitted yet"},
+                }
+            },
+        },
         500: {
             "content": {
                 "application/json": {
@@ -220,13 +503,25 @@ class ClaimTicketResponse(pydantic.BaseModel):
                 }
             },
         },
+        503: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Request deadline exceeded"},
+                }
+            },
+        },
     },
 )
 def claim_ticket(
     raffle_id: pydantic.UUID4,
+    idempotency_key: str | None = Header(None, max_length=255),
     ip_address: str = Depends(deps.get_ip_address),
-    conn: psycopg.Connection = Depends(deps.get_conn),
+    pool: ConnectionPool = Depends(deps.get_pool),
     settings: Settings = Depends(deps.get_settings),
+    idempotency_cache: ReplayCache = Depends(deps.get_idempotency_cache),
+    contention: ContentionTracker = Depends(deps.get_contention_tracker),
+    negative_cache: TTLCache = Depends(deps.get_negative_cache),
+    deadline: Deadline = Depends(deps.get_deadline),
 ) -> ClaimTicketResponse:
     """Attempt to claim a ticket in the given raffle.
 
@@ -237,17 +532,96 @@ def claim_ticket(
     3. The ticket intended to be claimed has been taken by another process
 
     Of these, only the third case is retryable. It is left to the caller to
-    retry or present an appropriate error to the user.
+    retry or present an appropriate error to the user. Claims before a raffle
+    opens are rejected with a `Retry-After` header giving the seconds to wait,
+    and claims for a raffle with a waiting room until the caller is admitted.
 
     To reduce the likelihood of the third case, we randomly choose a ticket to
-    claim from a configurable sized pool of the next tickets in line. If we see
-    high contention for claiming tickets then this pool size can be increased.
+    claim from a pool of the next tickets in line. The pool grows while claims
+    for the raffle are colliding and shrinks back once they stop, within the
+    configured bounds, and retries are spread out with a jittered backoff.
+
+    Clients may send an `Idempotency-Key` header to retry safely. A repeated
+    request with the same key from the same ip address replays the original
+    response, and one that arrives while the first is still running waits for
+    it instead of claiming again.
+
+    Raffles that are sold out or do not exist are remembered for a while, so
+    that repeated requests for them are rejected without touching the database.
+
+    Attempts stop with a 503 once the configured time budget is spent or the
+    client has disconnected.
     """
+
+    def claim() -> ClaimTicketResponse:
+        with _rejecting_known_raffles(negative_cache, raffle_id):
+            with db.connection(pool, deadline) as conn:
+                return _claim_ticket(
+                    conn, raffle_id, ip_address, settings, contention, deadline
+                )
+
+    if idempotency_key is None:
+        return claim()
+
+    return idempotency_cache.run((ip_address, raffle_id, idempotency_key), claim)
+
+
+@contextlib.contextmanager
+def _rejecting_known_raffles(negative_cache: TTLCache, raffle_id: uuid.UUID):
+    """Reject raffles known to be missing or sold out, and remember new ones."""
+    rejection = negative_cache.get(raffle_id)
+
+    if rejection is not None:
+        raise HTTPException(*rejection)
+
+    try:
+        yield
+    except HTTPException as exc:
+        if exc.status_code in (404, 410):
+            negative_cache.set(raffle_id, (exc.status_code, exc.detail))
+        raise
+
+
+def _claim_ticket(
+    conn: psycopg.Connection,
+    raffle_id: uuid.UUID,
+    ip_address: str,
+    settings: Settings,
+    contention: ContentionTracker,
+    deadline: Deadline,
+) -> ClaimTicketResponse:
     row = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
 
     if row is None:
         raise HTTPException(404, "Raffle not found")
 
+    if row.opens_at is not None:
+        opens_in = row.opens_at - datetime.datetime.now(datetime.timezone.utc)
+
+        if opens_in > datetime.timedelta(0):
+            raise HTTPException(
+                425,
+                "Raffle not open yet",
+                headers={"Retry-After": str(math.ceil(opens_in.total_seconds()))},
+            )
+
+    if not row.available_tickets:
+        raise HTTPException(410, "No tickets remaining")
+
+    if row.waiting_room:
+        entry = db.queries.fetch_queue_entry(
+            conn,
+            raffle_id=raffle_id,
+            ip_address=ip_address,
+            window=settings.waiting_room_window,
+        )
+
+        if entry is None:
+            raise HTTPException(403, "Not in queue")
+
+        if entry.position > entry.admitted_position:
+            raise HTTPException(429, "Not admitted yet")
+
     has_participated = db.queries.has_ip_address_participated(
         conn,
         raffle_id=raffle_id,
@@ -267,13 +641,19 @@ def claim_ticket(
             reraise=True,
             retry=retry_if_exception_type(psycopg.errors.UniqueViolation),
             stop=stop_after_attempt(settings.participate_max_attempts),
+            wait=wait_random_exponential(
+                multiplier=settings.participate_backoff_multiplier,
+                max=settings.participate_backoff_max,
+            ),
         ):
             with attempt:
+                deadline.check()
+
                 ticket_pool = list(
                     db.queries.fetch_ticket_pool(
                         conn,
                         raffle_id=row.raffle_id,
-                        limit=settings.participate_ticket_pool,
+                        limit=contention.pool_size(row.raffle_id),
                     )
                 )
 
@@ -282,16 +662,31 @@ def claim_ticket(
 
                 ticket = random.choice(ticket_pool)
 
-                with conn.transaction():
-                    db.queries.claim_ticket(
-                        conn,
-                        raffle_id=row.raffle_id,
-                        ticket_number=ticket.ticket_number,
-                        ip_address=ip_address,
-                        verification_code=verification_code,
-                        crypt_algorithm=settings.verification_code_crypt_algorithm,
-                    )
-                    db.queries.release_ticket(conn, raffle_id=raffle_id)
+                try:
+                    with db.pipeline(conn):
+                        db.queries.claim_ticket(
+                            conn,
+                            raffle_id=row.raffle_id,
+                            ticket_number=ticket.ticket_number,
+                            ip_address=ip_address,
+                            verification_code=verification_code,
+                            crypt_algorithm=settings.verification_code_crypt_algorithm,
+                        )
+                        db.queries.release_ticket(conn, raffle_id=raffle_id)
+                        db.queries.record_claim(conn, raffle_id=raffle_id)
+                except psycopg.errors.UniqueViolation as exc:
+                    # Only a taken ticket is worth retrying. The ip address key
+                    # is violated when two requests from one address race, and
+                    # partitions name their copy of the keys after themselves
+                    constraint = exc.diag.constraint_name or ""
+
+                    if constraint.endswith("_ip_address_key"):
+                        raise HTTPException(403, "Already participated")
+
+                    contention.record(row.raffle_id, collided=True)
+                    raise
+
+                contention.record(row.raffle_id, collided=False)
     except psycopg.errors.UniqueViolation:
         raise HTTPException(500, "Concurrency error")
 
@@ -301,6 +696,138 @@ def claim_ticket(
     )
 
 
+class QueueResponse(pydantic.BaseModel):
+    position: pydantic.PositiveInt = pydantic.Field(json_schema_extra={"example": 1500})
+    ahead: pydantic.NonNegativeInt = pydantic.Field(json_schema_extra={"example": 400})
+    admitted: bool = pydantic.Field(json_schema_extra={"example": False})
+
+
+QUEUE_RESPONSES = {
+    400: {
+        "content": {
+            "application/json": {
+                "example": {"detail": "No waiting room"},
+            }
+        },
+    },
+    403: {
+        "content": {
+            "application/json": {
+                "example": {"detail": "Not in queue"},
+            }
+        },
+    },
+    404: {
+        "content": {
+            "application/json": {
+                "example": {"detail": "Raffle not found"},
+            }
+        },
+    },
+    410: {
+        "content": {
+            "application/json": {
+                "example": {"detail": "No tickets remaining"},
+            }
+        },
+    },
+    503: {
+        "content": {
+            "application/json": {
+                "example": {"detail": "Request deadline exceeded"},
+            }
+        },
+    },
+}
+
+
+@app.post("/raffles/{raffle_id}/queue/", responses=QUEUE_RESPONSES)
+def join_queue(
+    raffle_id: pydantic.UUID4,
+    ip_address: str = Depends(deps.get_ip_address),
+    pool: ConnectionPool = Depends(deps.get_pool),
+    settings: Settings = Depends(deps.get_settings),
+    negative_cache: TTLCache = Depends(deps.get_negative_cache),
+    deadline: Deadline = Depends(deps.get_deadline),
+) -> QueueResponse:
+    """Take a place in the waiting room of a raffle.
+
+    Places are handed out in order of arrival, one per ip address, and joining
+    again returns the same place. Callers are admitted to claim a ticket once
+    the claims made so far, plus a window sized to the recent claim rate, reach
+    their place. So that callers who never claim do not hold up the queue,
+    admission also moves on by at least one window for every minute the raffle
+    has been open. The queue may be joined before the raffle opens.
+
+    Once the raffle is sold out, everyone still waiting is turned away without
+    touching the database.
+    """
+    with _rejecting_known_raffles(negative_cache, raffle_id):
+        with db.connection(pool, deadline) as conn:
+            return _queue_entry(conn, raffle_id, ip_address, settings, join=True)
+
+
+@app.get("/raffles/{raffle_id}/queue/", responses=QUEUE_RESPONSES)
+def fetch_queue_entry(
+    raffle_id: pydantic.UUID4,
+    ip_address: str = Depends(deps.get_ip_address),
+    pool: ConnectionPool = Depends(deps.get_pool),
+    settings: Settings = Depends(deps.get_settings),
+    negative_cache: TTLCache = Depends(deps.get_negative_cache),
+    deadline: Deadline = Depends(deps.get_deadline),
+) -> QueueResponse:
+    """Check the place of the caller in the waiting room of a raffle.
+
+    Poll this until `admitted` is true before claiming a ticket.
+    """
+    with _rejecting_known_raffles(negative_cache, raffle_id):
+        with db.connection(pool, deadline) as conn:
+            return _queue_entry(conn, raffle_id, ip_address, settings, join=False)
+
+
+def _queue_entry(
+    conn: psycopg.Connection,
+    raffle_id: uuid.UUID,
+    ip_address: str,
+    settings: Settings,
+    join: bool,
+) -> QueueResponse:
+    row = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+    if row is None:
+        raise HTTPException(404, "Raffle not found")
+
+    if not row.waiting_room:
+        raise HTTPException(400, "No waiting room")
+
+    if not row.available_tickets:
+        raise HTTPException(410, "No tickets remaining")
+
+    def fetch_entry():
+        return db.queries.fetch_queue_entry(
+            conn,
+            raffle_id=raffle_id,
+            ip_address=ip_address,
+            window=settings.waiting_room_window,
+        )
+
+    entry = fetch_entry()
+
+    # Joining again is checked first, so that returning callers only read
+    if entry is None and join:
+        db.queries.join_queue(conn, raffle_id=raffle_id, ip_address=ip_address)
+        entry = fetch_entry()
+
+    if entry is None:
+        raise HTTPException(403, "Not in queue")
+
+    return QueueResponse(
+        position=entry.position,
+        ahead=max(0, entry.position - entry.admitted_position),
+        admitted=entry.position <= entry.admitted_position,
+    )
+
+
 class WinnerResponse(pydantic.BaseModel):
     ticket_number: pydantic.PositiveInt = pydantic.Field(
         json_schema_extra={"example": 5}
@@ -308,12 +835,33 @@ class WinnerResponse(pydantic.BaseModel):
     prize: str = pydantic.Field(json_schema_extra={"example": "Prize Name"})
 
 
-@app.get("/raffles/{raffle_id}/winners/")
+@app.get(
+    "/raffles/{raffle_id}/winners/",
+    responses={
+        200: {
+            "headers": {
+                "Link": {
+                    "description": "URL of the next page of winners, if any",
+                    "schema": {"type": "string"},
+                }
+            }
+        },
+    },
+)
 def list_winners(
     raffle_id: pydantic.UUID4,
+    request: Request,
+    response: Response,
+    after_ticket: pydantic.NonNegativeInt = 0,
+    limit: int = Query(100, ge=1, le=1000),
     conn: psycopg.Connection = Depends(deps.get_conn),
 ) -> list[WinnerResponse]:
-    """Return a list of all winners for the given raffle and their prizes."""
+    """Return a page of winners for the given raffle and their prizes.
+
+    Winners are ordered by ticket number. When more winners may follow, the
+    `Link` header holds the URL of the next page, which continues after the
+    last ticket number of this one.
+    """
     raffle = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
 
     if raffle is None:
@@ -322,7 +870,21 @@ def list_winners(
     if not raffle.winners_drawn:
         raise HTTPException(400)
 
-    rows = db.queries.list_winners(conn, raffle_id=raffle_id)
+    rows = list(
+        db.queries.list_winners(
+            conn,
+            raffle_id=raffle_id,
+            after_ticket=after_ticket,
+            limit=limit,
+        )
+    )
+
+    if len(rows) == limit:
+        next_url = request.url.include_query_params(
+            after_ticket=rows[-1].ticket_number,
+            limit=limit,
+        )
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
 
     return [
         WinnerResponse(
@@ -333,6 +895,60 @@ def list_winners(
     ]
 
 
+@app.get(
+    "/raffles/{raffle_id}/winners/{ticket_number}/",
+    responses={
+        400: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Winners not drawn"},
+                }
+            }
+        },
+        404: {
+            "content": {
+                "application/json": {
+                    "examples": {
+                        "raffle_not_found": {
+                            "summary": "Raffle not found",
+                            "value": {"detail": "Raffle not found"},
+                        },
+                        "winner_not_found": {
+                            "summary": "Winner not found",
+                            "value": {"detail": "Winner not found"},
+                        },
+                    }
+                }
+            }
+        },
+    },
+)
+def fetch_winner(
+    raffle_id: pydantic.UUID4,
+    ticket_number: pydantic.PositiveInt,
+    conn: psycopg.Connection = Depends(deps.get_conn),
+) -> WinnerResponse:
+    """Return the prize won by a single ticket number in the given raffle."""
+    raffle = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+    if raffle is None:
+        raise HTTPException(404, "Raffle not found")
+
+    if not raffle.winners_drawn:
+        raise HTTPException(400, "Winners not drawn")
+
+    row = db.queries.fetch_winner(
+        conn,
+        raffle_id=raffle_id,
+        ticket_number=ticket_number,
+    )
+
+    if row is None:
+        raise HTTPException(404, "Winner not found")
+
+    return WinnerResponse(ticket_number=row.ticket_number, prize=row.prize)
+
+
 @app.post(
     "/raffles/{raffle_id}/winners/",
     dependencies=[Depends(deps.is_manager)],
@@ -388,39 +1004,217 @@ def draw_winners(
     if raffle.winners_drawn:
         raise HTTPException(400, "Winners already drawn")
 
-    prizes = [
-        prize
-        for template in db.queries.list_prizes(conn, raffle_id=raffle_id)
-        for prize in [template] * template.amount
-    ]
-
-    # Using random.sample not random.choices because a single ticket may not win
-    # multiple prizes
-    winning_numbers = random.sample(range(1, raffle.total_tickets + 1), k=len(prizes))
-
-    with conn.transaction():
-        db.queries.close_raffle(conn, raffle_id=raffle_id)
-        db.queries.assign_winners(
-            conn,
-            [
-                {
-                    "raffle_id": raffle_id,
-                    "ticket_number": ticket_number,
-                    "prize_id": prize.prize_id,
-                }
-                for prize, ticket_number in zip(prizes, winning_numbers)
-            ],
-        )
+    try:
+        winners = drawing.draw_winners(conn, raffle)
+    except drawing.DrawError as exc:
+        raise HTTPException(400, str(exc))
 
     return [
         WinnerResponse(
             ticket_number=ticket_number,
-            prize=prize.name,
+            prize=prize,
         )
-        for prize, ticket_number in zip(prizes, winning_numbers)
+        for ticket_number, prize in winners
     ]
 
 
+class ClaimRollupResponse(pydantic.BaseModel):
+    minute: datetime.datetime = pydantic.Field(
+        json_schema_extra={"example": "2023-08-01T12:00:00"}
+    )
+    claims: pydantic.PositiveInt = pydantic.Field(json_schema_extra={"example": 20})
+
+
+class RaffleAnalyticsResponse(pydantic.BaseModel):
+    raffle_id: pydantic.UUID4 = pydantic.Field(
+        json_schema_extra={"example": uuid.uuid4()}
+    )
+    created_at: datetime.datetime = pydantic.Field(
+        json_schema_extra={"example": "2023-08-01T11:58:30"}
+    )
+    sold_out_at: datetime.datetime | None = pydantic.Field(
+        json_schema_extra={"example": "2023-08-01T12:04:30"}
+    )
+    seconds_to_sell_out: float | None = pydantic.Field(
+        json_schema_extra={"example": 360.0}
+    )
+    fill_rate: float = pydantic.Field(json_schema_extra={"example": 1.0})
+    claims_per_minute: list[ClaimRollupResponse]
+
+
+@app.get(
+    "/raffles/{raffle_id}/analytics/",
+    dependencies=[Depends(deps.is_manager)],
+    responses={
+        403: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Unauthorized"},
+                }
+            }
+        },
+        404: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Raffle not found"},
+                }
+            }
+        },
+    },
+)
+def fetch_raffle_analytics(
+    raffle_id: pydantic.UUID4,
+    conn: psycopg.Connection = Depends(deps.get_conn),
+) -> RaffleAnalyticsResponse:
+    """Return the sales figures of a raffle.
+
+    Claims are counted per minute as they happen, so this only reads the
+    raffle and its pre-aggregated counts and never the participants. The time
+    to sell out is counted from the opening of the raffle, or from its creation
+    if it was open from the start.
+
+    Only requests from configured **manager** ip addresses will succeed.
+    """
+    raffle = db.queries.fetch_raffle_analytics(conn, raffle_id=raffle_id)
+
+    if raffle is None:
+        raise HTTPException(404, "Raffle not found")
+
+    rollups = db.queries.list_claim_rollups(conn, raffle_id=raffle_id)
+
+    return RaffleAnalyticsResponse(
+        raffle_id=raffle.raffle_id,
+        created_at=raffle.created_at,
+        sold_out_at=raffle.sold_out_at,
+        seconds_to_sell_out=(
+            (raffle.sold_out_at - raffle.opened_at).total_seconds()
+            if raffle.sold_out_at
+            else None
+        ),
+        fill_rate=1 - raffle.available_tickets / raffle.total_tickets,
+        claims_per_minute=[
+            ClaimRollupResponse(minute=rollup.bucket, claims=rollup.claims)
+            for rollup in rollups
+        ],
+    )
+
+
+class DrawJobResponse(pydantic.BaseModel):
+    raffle_id: pydantic.UUID4 = pydantic.Field(
+        json_schema_extra={"example": uuid.uuid4()}
+    )
+    status: Literal["pending", "done", "failed"] = pydantic.Field(
+        json_schema_extra={"example": "pending"}
+    )
+    error: str | None = pydantic.Field(json_schema_extra={"example": None})
+
+
+@app.post(
+    "/raffles/{raffle_id}/draw-job/",
+    status_code=202,
+    dependencies=[Depends(deps.is_manager)],
+    responses={
+        400: {
+            "content": {
+                "application/json": {
+                    "examples": {
+                        "tickets_remaining": {
+                            "summary": "Tickets remaining",
+                            "value": {"detail": "Tickets remaining"},
+                        },
+                        "winners_drawn": {
+                            "summary": "Winners already drawn",
+                            "value": {"detail": "Winners already drawn"},
+                        },
+                    }
+                }
+            }
+        },
+        403: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Unauthorized"},
+                }
+            }
+        },
+        404: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Raffle not found"},
+                }
+            }
+        },
+    },
+)
+def create_draw_job(
+    raffle_id: pydantic.UUID4,
+    conn: psycopg.Connection = Depends(deps.get_conn),
+) -> DrawJobResponse:
+    """Queue the winners of a raffle to be drawn in the background.
+
+    This is an alternative to drawing the winners within the request for large
+    raffles. A raffle only ever has one draw job, so retrying the request
+    returns the job that was already queued. The job is run by a separate
+    `raffle-cli worker` process and its status can be polled with a `GET`.
+
+    Only requests from configured **manager** ip addresses will succeed.
+    """
+    raffle = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+    if raffle is None:
+        raise HTTPException(404, "Raffle not found")
+
+    job = db.queries.fetch_draw_job(conn, raffle_id=raffle_id)
+
+    if job is None:
+        if raffle.available_tickets:
+            raise HTTPException(400, "Tickets remaining")
+
+        if raffle.winners_drawn:
+            raise HTTPException(400, "Winners already drawn")
+
+        db.queries.create_draw_job(conn, raffle_id=raffle_id)
+        job = db.queries.fetch_draw_job(conn, raffle_id=raffle_id)
+
+    return DrawJobResponse(raffle_id=job.raffle_id, status=job.status, error=job.error)
+
+
+@app.get(
+    "/raffles/{raffle_id}/draw-job/",
+    dependencies=[Depends(deps.is_manager)],
+    responses={
+        403: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Unauthorized"},
+                }
+            }
+        },
+        404: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Draw job not found"},
+                }
+            }
+        },
+    },
+)
+def fetch_draw_job(
+    raffle_id: pydantic.UUID4,
+    conn: psycopg.Connection = Depends(deps.get_conn),
+) -> DrawJobResponse:
+    """Return the status of the draw job queued for a raffle.
+
+    Only requests from configured **manager** ip addresses will succeed.
+    """
+    job = db.queries.fetch_draw_job(conn, raffle_id=raffle_id)
+
+    if job is None:
+        raise HTTPException(404, "Draw job not found")
+
+    return DrawJobResponse(raffle_id=job.raffle_id, status=job.status, error=job.error)
+
+
 class VerifyTicketRequest(pydantic.BaseModel):
     ticket_number: pydantic.PositiveInt = pydantic.Field(
         json_schema_extra={"example": 5}
@@ -527,3 +1321,184 @@ def verify_ticket(
     )
 
     return VerifyTicketResponse(has_won=bool(ticket.prize), prize=ticket.prize)
+
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+@app.get(
+    "/raffles/{raffle_id}/export/",
+    dependencies=[Depends(deps.is_manager)],
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {
+                "text/csv": {
+                    "example": (
+                        "ticket_number,ip_address,prize\n5,127.0.0.1,Prize Name\n"
+                    )
+                },
+                "application/x-ndjson": {
+                    "example": (
+                        '{"ticket_number":5,"ip_address":"127.0.0.1",'
+                        '"prize":"Prize Name"}\n'
+                    )
+                },
+            }
+        },
+        403: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Unauthorized"},
+                }
+            }
+        },
+        404: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Raffle not found"},
+                }
+            }
+        },
+    },
+)
+def export_raffle(
+    raffle_id: pydantic.UUID4,
+    format: Literal["csv", "ndjson"] = "csv",
+    conn: psycopg.Connection = Depends(deps.get_streaming_conn),
+) -> StreamingResponse:
+    """Stream every participant of a raffle along with any prize they won.
+
+    Only requests from configured **manager** ip addresses will succeed.
+    """
+    raffle = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+    if raffle is None:
+        raise HTTPException(404, "Raffle not found")
+
+    return StreamingResponse(
+        db.export_participants(conn, raffle_id=raffle_id, format=format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+    )
+
+
+class TicketResponse(pydantic.BaseModel):
+    raffle_id: pydantic.UUID4 = pydantic.Field(
+        json_schema_extra={"example": uuid.uuid4()}
+    )
+    raffle_name: str = pydantic.Field(json_schema_extra={"example": "Raffle Name"})
+    ticket_number: pydantic.PositiveInt = pydantic.Field(
+        json_schema_extra={"example": 5}
+    )
+    claimed_at: datetime.datetime = pydantic.Field(
+        json_schema_extra={"example": "2023-08-01T12:00:00"}
+    )
+    winners_drawn: bool = pydantic.Field(json_schema_extra={"example": True})
+    prize: str | None = pydantic.Field(json_schema_extra={"example": "Prize Name"})
+
+
+@app.get(
+    "/tickets/",
+    responses={
+        200: {
+            "headers": {
+                "Link": {
+                    "description": "URL of the next page of tickets, if any",
+                    "schema": {"type": "string"},
+                }
+            }
+        },
+    },
+)
+async def list_tickets(
+    request: Request,
+    response: Response,
+    after_raffle: pydantic.UUID4 | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    ip_address: str = Depends(deps.get_ip_address),
+    pools: tuple[ConnectionPool] = Depends(deps.get_pools),
+    deadline: Deadline = Depends(deps.get_deadline),
+) -> list[TicketResponse]:
+    """Return a page of the tickets claimed from your ip address in any raffle.
+
+    Tickets are ordered by raffle id. When more tickets may follow, the `Link`
+    header holds the URL of the next page, which continues after the last
+    raffle of this one. Verification codes are never returned.
+    """
+
+    def fetch(pool: ConnectionPool):
+        with db.connection(pool, deadline) as conn:
+            return list(
+                db.queries.list_participant_tickets(
+                    conn,
+                    ip_address=ip_address,
+                    after_raffle=after_raffle or uuid.UUID(int=0),
+                    limit=limit,
+                )
+            )
+
+    shards = await asyncio.gather(*(run_in_threadpool(fetch, pool) for pool in pools))
+    rows = list(
+        itertools.islice(
+            heapq.merge(*shards, key=operator.attrgetter("raffle_id")),
+            limit,
+        )
+    )
+
+    if len(rows) == limit:
+        next_url = request.url.include_query_params(
+            after_raffle=rows[-1].raffle_id,
+            limit=limit,
+        )
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    return [
+        TicketResponse(
+            raffle_id=row.raffle_id,
+            raffle_name=row.name,
+            ticket_number=row.ticket_number,
+            claimed_at=row.claimed_at,
+            winners_drawn=row.winners_drawn,
+            prize=row.prize,
+        )
+        for row in rows
+    ]
+
+
+class StatsResponse(pydantic.BaseModel):
+    read_queries: pydantic.NonNegativeInt = pydantic.Field(
+        json_schema_extra={"example": 120}
+    )
+    coalesced_reads: pydantic.NonNegativeInt = pydantic.Field(
+        json_schema_extra={"example": 4800}
+    )
+
+
+@app.get(
+    "/stats/",
+    dependencies=[Depends(deps.is_manager)],
+    responses={
+        403: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Unauthorized"},
+                }
+            }
+        },
+    },
+)
+def fetch_stats(
+    reads: SingleFlight = Depends(deps.get_read_coalescer),
+) -> StatsResponse:
+    """Return counters of this worker process since it started.
+
+    Reads of raffles are coalesced, so `coalesced_reads` counts the requests
+    that shared the result of another identical request in flight rather than
+    querying the database themselves.
+
+    Only requests from configured **manager** ip addresses will succeed.
+    """
+    return StatsResponse(read_queries=reads.calls, coalesced_reads=reads.shared)
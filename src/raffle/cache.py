@@ -0,0 +1,120 @@
+"""Small in-process caches shared between the request threads of a worker.
+
+FastAPI runs the synchronous endpoints in a threadpool, so everything here is
+guarded by a lock and safe to share between concurrent requests.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire `ttl` seconds after being set.
+
+    Once `maxsize` entries are held, the oldest entry is evicted to make room,
+    so the memory used is fixed no matter how many distinct keys are seen.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            return value
+
+    def set(self, key: Hashable, value: object):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into a single call.
+
+    The first caller for a key runs the function while any others that arrive
+    before it finishes wait and receive the same result or exception. The
+    number of calls made and of calls that shared another's result are counted.
+    Results are shared as they are, so functions must not return one-shot
+    iterators such as the rows of a select query. Callers that wait give up
+    with `TimeoutError` after their own timeout, leaving the call running for
+    the rest.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self, key: Hashable, func: Callable[[], T], timeout: float | None = None
+    ) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+
+            if is_leader:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not is_leader:
+            return future.result(timeout)
+
+        try:
+            result = func()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class ReplayCache:
+    """Remember successful results for a while so repeated calls replay them.
+
+    Calls that arrive while the first is still running wait for its outcome
+    rather than running the function a second time.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight = SingleFlight()
+
+    def run(self, key: Hashable, func: Callable[[], T]) -> T:
+        def replay_or_run() -> T:
+            result = self._results.get(key)
+
+            if result is None:
+                result = func()
+                self._results.set(key, result)
+
+            return result
+
+        return self._in_flight.do(key, replay_or_run)
@@ -1,9 +1,14 @@
+import contextlib
+import sys
+import uuid
+from typing import Optional
+
 import psycopg
 import typer
 import uvicorn
 from typer import Exit, Option, Typer
 
-from . import config, db
+from . import compaction, config, db, jobs, seeding
 
 app = Typer()
 
@@ -14,14 +19,95 @@ def migrate(up: bool = Option(True, "--up/--down")):
     operation = db.migrations.create_schema if up else db.migrations.delete_schema
     settings = config.load_settings()
 
-    with db.create_connection(settings) as conn:
+    for shard in range(len(settings.db_urls)):
+        with db.create_connection(settings, shard) as conn:
+            db.configure_partitions(conn, settings)
+
+            try:
+                operation(conn)
+            except (psycopg.errors.DuplicateObject, psycopg.errors.DuplicateTable):
+                typer.echo(f"Migrations already applied to shard {shard}", err=True)
+                raise Exit(code=1)
+
+    typer.echo("Migrations applied successfully")
+
+
+@app.command()
+def compact(limit: Optional[int] = Option(None, help="Maximum raffles to compact")):
+    """Archive the participants of drawn raffles and drop their tickets."""
+    settings = config.load_settings()
+    compacted = 0
+
+    for shard in range(len(settings.db_urls)):
+        with db.create_connection(settings, shard) as conn:
+            remaining = None if limit is None else limit - compacted
+            compacted += compaction.compact_raffles(
+                conn, limit=remaining, min_age=settings.compact_min_age
+            )
+
+    typer.echo(f"Compacted {compacted} raffles")
+
+
+@app.command()
+def export(raffle_id: uuid.UUID, format: str = Option("csv", help="csv or ndjson")):
+    """Write every participant of a raffle and their prize to stdout."""
+    if format not in db.EXPORT_FORMATS:
+        typer.echo(f"Unknown export format {format}", err=True)
+        raise Exit(code=1)
+
+    settings = config.load_settings()
+    shard = db.shard_index(raffle_id, len(settings.db_urls))
+
+    with db.create_connection(settings, shard) as conn:
+        for data in db.export_participants(conn, raffle_id=raffle_id, format=format):
+            sys.stdout.buffer.write(data)
+
+
+@app.command()
+def seed(
+    raffles: int = Option(1_000, help="Number of raffles to create"),
+    min_tickets: int = Option(10, help="Fewest tickets in a raffle"),
+    max_tickets: int = Option(10_000, help="Most tickets in a raffle"),
+    max_prizes: int = Option(5, help="Most kinds of prize in a raffle"),
+    sold_out: float = Option(0.3, help="Share of raffles sold out but not drawn"),
+    drawn: float = Option(0.3, help="Share of raffles drawn"),
+    players: int = Option(100_000, help="Number of distinct participants"),
+    days: int = Option(30, help="Days over which raffles were created"),
+    random_seed: int = Option(0, "--seed", help="Seed for the random choices"),
+):
+    """Bulk load synthetic raffles, participants and winners for load testing.
+
+    Raffles not sold out are partly claimed. Every participant's verification
+    code is SEEDCODE.
+    """
+    settings = config.load_settings()
+    shards = range(len(settings.db_urls))
+
+    with contextlib.ExitStack() as stack:
+        conns = [
+            stack.enter_context(db.create_connection(settings, shard))
+            for shard in shards
+        ]
+
         try:
-            operation(conn)
-        except (psycopg.errors.DuplicateObject, psycopg.errors.DuplicateTable):
-            typer.echo("Migrations already applied", err=True)
+            seeded = seeding.seed_raffles(
+                conns,
+                raffles=raffles,
+                min_tickets=min_tickets,
+                max_tickets=max_tickets,
+                max_prizes=max_prizes,
+                sold_out_ratio=sold_out,
+                drawn_ratio=drawn,
+                players=players,
+                days=days,
+                seed=random_seed,
+                crypt_algorithm=settings.verification_code_crypt_algorithm,
+            )
+        except ValueError as exc:
+            typer.echo(str(exc), err=True)
             raise Exit(code=1)
-        else:
-            typer.echo("Migrations applied successfully")
+
+    typer.echo(f"Seeded {seeded} raffles")
 
 
 @app.command()
@@ -30,5 +116,18 @@ def run(host: str = "127.0.0.1", reload: bool = Option(False, "--reload/--no-rel
     uvicorn.run("raffle.api:app", host=host, reload=reload)
 
 
+@app.command()
+def worker(shard: int = Option(0, help="Shard to take draw jobs from")):
+    """Run the queued draw jobs until interrupted."""
+    settings = config.load_settings()
+
+    if not 0 <= shard < len(settings.db_urls):
+        typer.echo(f"Unknown shard {shard}", err=True)
+        raise Exit(code=1)
+
+    with db.create_connection(settings, shard) as conn:
+        jobs.run_draw_worker(conn, poll_interval=settings.draw_job_poll_interval)
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,67 @@
+"""Move the participants of drawn raffles out of the per-ticket tables.
+
+Once winners have been drawn a raffle is final, so its tickets are no longer
+needed and its participants and winners are only ever read back for
+`list_winners` and `verify_ticket`. Compaction folds each participant and any
+prize they won into a single row of `archived_participants` and deletes the
+raffle's rows from `tickets`, `participants` and `winners`. Raffles are only
+compacted a while after their draw, so that winners can still be looked up
+from the per-ticket tables while the results are fresh.
+"""
+import asyncio
+import logging
+
+import psycopg
+from psycopg_pool import ConnectionPool
+from starlette.concurrency import run_in_threadpool
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+
+def compact_raffles(
+    conn: psycopg.Connection, limit: int | None = None, min_age: int = 0
+) -> int:
+    """Compact drawn raffles one at a time and return how many were compacted.
+
+    Only raffles drawn at least `min_age` seconds ago are compacted.
+
+    Each raffle is locked with `skip locked` in its own transaction, so several
+    processes may compact at the same time without waiting on each other.
+    """
+    compacted = 0
+
+    while limit is None or compacted < limit:
+        with conn.transaction():
+            raffle_id = db.queries.lock_compactable_raffle(conn, min_age=min_age)
+
+            if raffle_id is None:
+                break
+
+            db.queries.archive_participants(conn, raffle_id=raffle_id)
+            db.queries.delete_winners(conn, raffle_id=raffle_id)
+            db.queries.delete_participants(conn, raffle_id=raffle_id)
+            db.queries.delete_tickets(conn, raffle_id=raffle_id)
+            db.queries.delete_queue_entries(conn, raffle_id=raffle_id)
+            db.queries.archive_raffle(conn, raffle_id=raffle_id)
+
+        compacted += 1
+
+    return compacted
+
+
+async def compact_periodically(pool: ConnectionPool, interval: int, min_age: int):
+    """Compact drawn raffles in the background every `interval` seconds."""
+
+    def compact():
+        with db.connection(pool, None) as conn:
+            return compact_raffles(conn, min_age=min_age)
+
+    while True:
+        try:
+            await run_in_threadpool(compact)
+        except Exception:
+            logger.exception("Failed to compact raffles")
+
+        await asyncio.sleep(interval)
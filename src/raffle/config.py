@@ -1,40 +1,92 @@
 import string
+from pathlib import Path
 from typing import Literal
 
 import pydantic
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+DB_CONNECTION_FIELDS = ("db_database", "db_host", "db_password", "db_port", "db_user")
+
 
 class Settings(BaseSettings):
     # application settings
+    compact_interval: pydantic.PositiveInt | None = None
+    compact_min_age: pydantic.NonNegativeInt = 3600
+    draw_job_poll_interval: pydantic.PositiveFloat = 1.0
+    endpoint_timeouts: dict[str, pydantic.PositiveFloat] = {
+        "draw_winners": 60.0,
+    }
+    events_interval: pydantic.PositiveFloat = 1.0
+    idempotency_cache_size: pydantic.PositiveInt = 10_000
+    idempotency_cache_ttl: pydantic.PositiveInt = 300
     manager_ip_addresses: list[str] = []
+    negative_cache_size: pydantic.PositiveInt = 10_000
+    negative_cache_ttl: pydantic.PositiveInt = 60
+    participate_backoff_max: pydantic.NonNegativeFloat = 0.2
+    participate_backoff_multiplier: pydantic.NonNegativeFloat = 0.01
     participate_max_attempts: pydantic.PositiveInt = 3
     participate_ticket_pool: pydantic.PositiveInt = 10
+    participate_ticket_pool_max: pydantic.PositiveInt = 100
+    participate_tracked_raffles: pydantic.PositiveInt = 1_000
+    prewarm_lead: pydantic.PositiveFloat | None = None
+    profile_dir: Path = Path("profiles")
+    profile_interval: pydantic.PositiveFloat = 0.001
+    profile_sample_rate: float = Field(0.0, ge=0.0, le=1.0)
+    request_timeout: pydantic.PositiveFloat = 5.0
     verification_code_allowed_characters: str = string.ascii_uppercase
     verification_code_crypt_algorithm: Literal["bf", "des", "md5", "xdes"] = "bf"
     verification_code_length: pydantic.PositiveInt = 8
+    waiting_room_window: pydantic.PositiveInt = 100
 
     # database settings
-    db_database: str = Field(alias="PGDATABASE")
-    db_host: str = Field(alias="PGHOST")
-    db_password: pydantic.SecretStr = Field(alias="PGPASSWORD")
-    db_port: str = Field(alias="PGPORT")
-    db_user: str = Field(alias="PGUSER")
+    db_backend: Literal["memory", "postgres"] = "postgres"
+    db_database: str | None = Field(None, alias="PGDATABASE")
+    db_host: str | None = Field(None, alias="PGHOST")
+    db_partitions: pydantic.PositiveInt = 1
+    db_pool_max_waiting: pydantic.NonNegativeInt = 0
+    db_pool_size: pydantic.PositiveInt = 4
+    db_pool_size_claims: pydantic.PositiveInt = 4
+    db_pool_size_manager: pydantic.PositiveInt = 2
+    db_pool_size_verification: pydantic.PositiveInt = 2
+    db_password: pydantic.SecretStr | None = Field(None, alias="PGPASSWORD")
+    db_port: str | None = Field(None, alias="PGPORT")
+    db_shard_urls: list[str] = []
+    db_user: str | None = Field(None, alias="PGUSER")
 
     model_config = SettingsConfigDict(env_file=".env")
 
+    @pydantic.model_validator(mode="after")
+    def check_db_connection(self) -> "Settings":
+        """Require the connection settings unless the data is kept in memory."""
+        if self.db_backend == "postgres":
+            missing = [
+                field.alias
+                for name, field in self.model_fields.items()
+                if name in DB_CONNECTION_FIELDS and getattr(self, name) is None
+            ]
+            if missing:
+                raise ValueError(f"{', '.join(missing)} required for postgres")
+        return self
+
     def __hash__(self):
         return hash(repr(self))
 
     @property
     def db_url(self) -> str:
+        if self.db_backend == "memory":
+            return "memory://"
         return (
             "postgresql://"
             f"{self.db_user}:{self.db_password.get_secret_value()}@"
             f"{self.db_host}:{self.db_port}/{self.db_database}"
         )
 
+    @property
+    def db_urls(self) -> list[str]:
+        """Return the database of each shard, or just the configured database."""
+        return self.db_shard_urls or [self.db_url]
+
 
 def load_settings(**kwargs) -> Settings:
     return Settings(**kwargs)
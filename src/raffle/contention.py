@@ -0,0 +1,53 @@
+"""Adapt the claim ticket pool size to the contention seen for each raffle.
+
+Claiming a random ticket from a pool of the next available tickets makes it
+less likely that concurrent participants collide on the same ticket. A larger
+pool means fewer collisions but tickets being handed out further from their
+random order, so the pool is only grown while collisions are being seen.
+"""
+import threading
+import uuid
+
+from .cache import TTLCache
+
+# Weight given to the latest attempt in the moving average of collisions
+SMOOTHING = 0.1
+
+# Collision rate below which the pool is allowed to shrink again
+TARGET_COLLISION_RATE = 0.05
+
+# Raffles without any claims for this many seconds start again from the floor
+TRACKING_TTL = 3600
+
+
+class ContentionTracker:
+    """Track the recent collision rate of claims and size the pool per raffle.
+
+    Every collision doubles the raffle's pool size up to `max_pool` while each
+    successful claim shrinks it by one towards `min_pool`, but only once the
+    moving average of collisions has fallen below the target rate.
+    """
+
+    def __init__(self, min_pool: int, max_pool: int, maxsize: int):
+        self.min_pool = min_pool
+        self.max_pool = max(min_pool, max_pool)
+        self._raffles = TTLCache(maxsize=maxsize, ttl=TRACKING_TTL)
+        self._lock = threading.Lock()
+
+    def pool_size(self, raffle_id: uuid.UUID) -> int:
+        pool_size, _ = self._raffles.get(raffle_id, (self.min_pool, 0.0))
+        return pool_size
+
+    def record(self, raffle_id: uuid.UUID, collided: bool):
+        with self._lock:
+            pool_size, collision_rate = self._raffles.get(
+                raffle_id, (self.min_pool, 0.0)
+            )
+            collision_rate += SMOOTHING * (collided - collision_rate)
+
+            if collided:
+                pool_size = min(self.max_pool, pool_size * 2)
+            elif collision_rate < TARGET_COLLISION_RATE:
+                pool_size = max(self.min_pool, pool_size - 1)
+
+            self._raffles.set(raffle_id, (pool_size, collision_rate))
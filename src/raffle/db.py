@@ -1,35 +1,284 @@
+import contextlib
+import csv
+import io
+import itertools
+import json
+import math
+import uuid
+import weakref
 from pathlib import Path
+from typing import Iterator, Literal
 
 import aiosql
 import psycopg
 import psycopg.rows
 import psycopg_pool
+from aiosql.adapters import PyFormatAdapter
 
+from . import memory
 from .config import Settings
+from .deadlines import Deadline
+
+
+class StorageAdapter(PyFormatAdapter):
+    """Run each named query with psycopg, or in memory on a memory connection.
+
+    Memory connections run the method of their store named after the query
+    with the same parameters, and both migration scripts reset the store.
+    """
+
+    def select(self, conn, query_name, sql, parameters, record_class=None):
+        if isinstance(conn, memory.Connection):
+            return iter(conn.run(query_name, parameters))
+
+        return super().select(conn, query_name, sql, parameters, record_class)
+
+    def select_one(self, conn, query_name, sql, parameters, record_class=None):
+        if isinstance(conn, memory.Connection):
+            return conn.run(query_name, parameters)
+
+        return super().select_one(conn, query_name, sql, parameters, record_class)
+
+    def select_value(self, conn, query_name, sql, parameters):
+        if isinstance(conn, memory.Connection):
+            return conn.run(query_name, parameters)
+
+        return super().select_value(conn, query_name, sql, parameters)
+
+    def insert_update_delete(self, conn, query_name, sql, parameters):
+        if isinstance(conn, memory.Connection):
+            conn.run(query_name, parameters)
+            return -1
+
+        return super().insert_update_delete(conn, query_name, sql, parameters)
+
+    def insert_update_delete_many(self, conn, query_name, sql, parameters):
+        if isinstance(conn, memory.Connection):
+            with conn.transaction():
+                for row in parameters:
+                    conn.run(query_name, row)
+            return -1
+
+        return super().insert_update_delete_many(conn, query_name, sql, parameters)
+
+    def insert_returning(self, conn, query_name, sql, parameters):
+        if isinstance(conn, memory.Connection):
+            return conn.run(query_name, parameters)
+
+        return super().insert_returning(conn, query_name, sql, parameters)
+
+    def execute_script(self, conn, sql):
+        if isinstance(conn, memory.Connection):
+            conn.store.reset()
+            return "DONE"
+
+        return super().execute_script(conn, sql)
+
 
 migrations_path = Path(__file__).parent / "migrations"
-migrations = aiosql.from_path(migrations_path, "psycopg")
+migrations = aiosql.from_path(migrations_path, StorageAdapter)
 
 queries_path = Path(__file__).parent / "queries"
-queries = aiosql.from_path(queries_path, "psycopg")
+queries = aiosql.from_path(queries_path, StorageAdapter)
 
 
+EXPORT_FORMATS = {
+    "csv": "copy ({query}) to stdout with (format csv, header)",
+    "ndjson": "copy (select row_to_json(export) from ({query}) as export) to stdout",
+}
+
 GLOBAL_CONNECTION_SETTINGS = {
     "autocommit": True,
     "row_factory": psycopg.rows.namedtuple_row,
 }
 
+# The statement timeout in milliseconds last set on each pooled connection,
+# where zero means none
+_statement_timeouts: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+# Milliseconds by which a statement timeout already set may end before the
+# deadline and still be kept, as it cannot let a statement run past it
+STATEMENT_TIMEOUT_SLACK = 500
 
-def create_pool(settings: Settings) -> psycopg_pool.ConnectionPool:
-    """Return a connection pool used for the entire application lifecycle."""
+
+def shard_index(raffle_id: uuid.UUID, shards: int) -> int:
+    """Return the shard that stores a raffle.
+
+    The random bits of the uuid are used rather than `hash` so that every
+    process agrees on the shard.
+    """
+    return raffle_id.int % shards
+
+
+def create_pool(
+    settings: Settings,
+    shard: int = 0,
+    bulkhead: str = "default",
+) -> psycopg_pool.ConnectionPool | memory.Pool:
+    """Return a connection pool used for the entire application lifecycle.
+
+    Each bulkhead has its own pools, sized in the settings. Requests wait for
+    a free connection unless too many are already waiting, in which case they
+    are turned away at once. Memory pools are not limited in size.
+    """
+    if settings.db_backend == "memory":
+        return memory.Pool(memory.get_store(settings.db_urls[shard]))
+
+    size = {
+        "claims": settings.db_pool_size_claims,
+        "manager": settings.db_pool_size_manager,
+        "verification": settings.db_pool_size_verification,
+    }.get(bulkhead, settings.db_pool_size)
 
     def configure(conn: psycopg.Connection):
         for attribute, value in GLOBAL_CONNECTION_SETTINGS.items():
             setattr(conn, attribute, value)
 
-    return psycopg_pool.ConnectionPool(settings.db_url, configure=configure)
+    return psycopg_pool.ConnectionPool(
+        settings.db_urls[shard],
+        min_size=size,
+        max_waiting=settings.db_pool_max_waiting,
+        name=f"{bulkhead}-{shard}",
+        configure=configure,
+    )
+
 
+@contextlib.contextmanager
+def connection(
+    pool: psycopg_pool.ConnectionPool,
+    deadline: Deadline | None,
+    limit_statements: bool = True,
+) -> Iterator[psycopg.Connection]:
+    """Check out a connection that gives up once the deadline has passed.
 
-def create_connection(settings: Settings) -> psycopg.Connection:
+    Both the wait for a free connection and every statement run on it are
+    limited to the time remaining, unless `limit_statements` is false (as for
+    exports, which stream for as long as the client keeps reading). Without a
+    deadline neither is limited.
+
+    The statement timeout stays on the connection when it goes back to the
+    pool. It is only sent again when a checkout needs a shorter one, or one
+    more than `STATEMENT_TIMEOUT_SLACK` longer, so that most checkouts of a
+    bulkhead cost no extra round trip.
+    """
+    timeout = None
+
+    if deadline is not None:
+        deadline.check()
+        timeout = deadline.remaining()
+
+    with pool.connection(timeout=timeout) as conn:
+        if not isinstance(conn, memory.Connection):
+            milliseconds = 0
+
+            if deadline is not None and limit_statements:
+                # A timeout of zero would disable it, so round up to the next ms
+                milliseconds = max(1, math.ceil(deadline.remaining() * 1000))
+
+            current = _statement_timeouts.get(conn, 0)
+
+            if milliseconds:
+                keep = 0 < current <= milliseconds <= current + STATEMENT_TIMEOUT_SLACK
+            else:
+                keep = current == 0
+
+            if not keep:
+                conn.execute(
+                    "select set_config('statement_timeout', %s, false)",
+                    [f"{milliseconds}ms"],
+                )
+                _statement_timeouts[conn] = milliseconds
+
+        yield conn
+
+
+@contextlib.contextmanager
+def pipeline(conn: psycopg.Connection) -> Iterator[None]:
+    """Run the block in a transaction with its statements sent in one flush.
+
+    In pipeline mode statements are sent without waiting for the result of the
+    previous one, so a block of writes costs a single round trip rather than
+    one per statement. Errors are raised when the block exits, and a query
+    that returns rows flushes the pipeline early when its result is read.
+    """
+    if not psycopg.Pipeline.is_supported():
+        with conn.transaction():
+            yield
+        return
+
+    with conn.pipeline(), conn.transaction():
+        yield
+
+
+def create_connection(
+    settings: Settings, shard: int = 0
+) -> psycopg.Connection | memory.Connection:
     """Return an individual connection used for ad-hoc queries."""
-    return psycopg.connect(settings.db_url, **GLOBAL_CONNECTION_SETTINGS)
+    if settings.db_backend == "memory":
+        return memory.Connection(memory.get_store(settings.db_urls[shard]))
+
+    return psycopg.connect(settings.db_urls[shard], **GLOBAL_CONNECTION_SETTINGS)
+
+
+def configure_partitions(conn: psycopg.Connection, settings: Settings):
+    """Set the number of hash partitions used when creating the schema."""
+    if isinstance(conn, memory.Connection):
+        return
+
+    conn.execute(
+        "select set_config('raffle.partitions', %s, false)",
+        [str(settings.db_partitions)],
+    )
+
+
+def export_participants(
+    conn: psycopg.Connection,
+    raffle_id: uuid.UUID,
+    format: Literal["csv", "ndjson"],
+) -> Iterator[bytes]:
+    """Stream every participant of a raffle and their prize with `copy`.
+
+    Rows are yielded as they arrive from the server so that memory use stays
+    flat regardless of the number of participants. Memory connections format
+    the rows of the query in the same way.
+    """
+    if isinstance(conn, memory.Connection):
+        yield from _format_rows(
+            queries.export_participants(conn, raffle_id=raffle_id), format
+        )
+        return
+
+    query = EXPORT_FORMATS[format].format(
+        query=queries.export_participants.sql.rstrip(";")
+    )
+
+    with conn.cursor().copy(query, {"raffle_id": raffle_id}) as copy:
+        if format == "csv":
+            for data in copy:
+                yield bytes(data)
+        else:
+            # Text format copy escapes backslashes, so decode each json row
+            # rather than forwarding the raw data
+            copy.set_types(["text"])
+            for (row,) in copy.rows():
+                yield f"{row}\n".encode()
+
+
+def _format_rows(
+    rows: Iterator[tuple], format: Literal["csv", "ndjson"]
+) -> Iterator[bytes]:
+    """Yield rows of a memory query as `copy` would write them."""
+    if format == "ndjson":
+        for row in rows:
+            yield (json.dumps(row._asdict(), separators=(",", ":")) + "\n").encode()
+        return
+
+    # Each line is sent as soon as it is written, like the rows of `copy`
+    data = io.StringIO()
+    writer = csv.writer(data, lineterminator="\n")
+
+    for row in itertools.chain([memory.ExportRow._fields], rows):
+        writer.writerow(row)
+        yield data.getvalue().encode()
+        data.seek(0)
+        data.truncate()
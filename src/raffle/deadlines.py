@@ -0,0 +1,44 @@
+"""Bound how long a request may keep working on behalf of its client.
+
+Each endpoint has a time budget in the settings. The budget caps the wait for a
+pooled connection, becomes the `statement_timeout` of that connection and is
+checked again before retrying work, so that requests fail fast under overload
+instead of holding connections long after their clients have given up.
+"""
+import time
+from typing import Awaitable, Callable
+
+import anyio.from_thread
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of time or its client has disconnected."""
+
+
+class Deadline:
+    """The point in time by which a request must have finished its work."""
+
+    def __init__(
+        self,
+        budget: float,
+        is_disconnected: Callable[[], Awaitable[bool]] | None = None,
+    ):
+        self.expires_at = time.monotonic() + budget
+        self._is_disconnected = is_disconnected
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """Raise unless time remains and the client is still waiting.
+
+        The client is only asked about from the threadpool that synchronous
+        endpoints and dependencies run in.
+        """
+        if not self.remaining():
+            raise DeadlineExceeded("Request deadline exceeded")
+
+        if self._is_disconnected is not None and anyio.from_thread.run(
+            self._is_disconnected
+        ):
+            raise DeadlineExceeded("Client disconnected")
@@ -1,11 +1,17 @@
 import functools
 
+import pydantic
 from fastapi import Depends, HTTPException, Request
 from psycopg import Connection
 from psycopg_pool import ConnectionPool
 
+from .cache import ReplayCache, SingleFlight, TTLCache
 from .config import Settings, load_settings
-from .db import create_pool
+from .contention import ContentionTracker
+from .db import connection, create_pool, shard_index
+from .deadlines import Deadline
+from .events import RaffleEvents
+from .memory import get_store
 
 
 @functools.cache
@@ -13,13 +19,116 @@ def get_settings() -> Settings:
     return load_settings()
 
 
+# Endpoints with connection pools of their own, so that a burst of one kind of
+# request cannot starve the others. Slow manager requests such as exports and
+# draws are kept apart from the public reads, which share the default.
+BULKHEADS = {
+    "claim_ticket": "claims",
+    "create_draw_job": "manager",
+    "create_raffle": "manager",
+    "draw_winners": "manager",
+    "export_raffle": "manager",
+    "fetch_draw_job": "manager",
+    "fetch_raffle_analytics": "manager",
+    "verify_ticket": "verification",
+}
+
+
+@functools.cache
+def get_bulkhead_pools(settings: Settings, bulkhead: str) -> tuple[ConnectionPool]:
+    return tuple(
+        create_pool(settings, shard, bulkhead) for shard in range(len(settings.db_urls))
+    )
+
+
+def get_pools(
+    request: Request,
+    settings: Settings = Depends(get_settings),
+) -> tuple[ConnectionPool]:
+    bulkhead = BULKHEADS.get(request.scope["endpoint"].__name__, "default")
+    return get_bulkhead_pools(settings, bulkhead)
+
+
+def get_pool(
+    raffle_id: pydantic.UUID4,
+    pools: tuple[ConnectionPool] = Depends(get_pools),
+) -> ConnectionPool:
+    return pools[shard_index(raffle_id, len(pools))]
+
+
+@functools.cache
+def get_idempotency_cache(settings: Settings = Depends(get_settings)) -> ReplayCache:
+    return ReplayCache(
+        maxsize=settings.idempotency_cache_size,
+        ttl=settings.idempotency_cache_ttl,
+    )
+
+
+@functools.cache
+def get_read_coalescer(settings: Settings = Depends(get_settings)) -> SingleFlight:
+    return SingleFlight()
+
+
 @functools.cache
-def get_pool(settings: Settings = Depends(get_settings)) -> ConnectionPool:
-    return create_pool(settings)
+def get_contention_tracker(
+    settings: Settings = Depends(get_settings),
+) -> ContentionTracker:
+    return ContentionTracker(
+        min_pool=settings.participate_ticket_pool,
+        max_pool=settings.participate_ticket_pool_max,
+        maxsize=settings.participate_tracked_raffles,
+    )
+
+
+@functools.cache
+def get_negative_cache(settings: Settings = Depends(get_settings)) -> TTLCache:
+    return TTLCache(
+        maxsize=settings.negative_cache_size,
+        ttl=settings.negative_cache_ttl,
+    )
+
+
+@functools.cache
+def get_shard_events(settings: Settings = Depends(get_settings)) -> tuple[RaffleEvents]:
+    return tuple(
+        RaffleEvents(
+            db_url,
+            settings.events_interval,
+            store=get_store(db_url) if settings.db_backend == "memory" else None,
+        )
+        for db_url in settings.db_urls
+    )
+
+
+def get_raffle_events(
+    raffle_id: pydantic.UUID4,
+    events: tuple[RaffleEvents] = Depends(get_shard_events),
+) -> RaffleEvents:
+    return events[shard_index(raffle_id, len(events))]
+
+
+def get_deadline(
+    request: Request,
+    settings: Settings = Depends(get_settings),
+) -> Deadline:
+    endpoint = request.scope["endpoint"].__name__
+    budget = settings.endpoint_timeouts.get(endpoint, settings.request_timeout)
+    return Deadline(budget, request.is_disconnected)
+
+
+def get_conn(
+    pool: ConnectionPool = Depends(get_pool),
+    deadline: Deadline = Depends(get_deadline),
+) -> Connection:
+    with connection(pool, deadline) as conn:
+        yield conn
 
 
-def get_conn(pool: ConnectionPool = Depends(get_pool)) -> Connection:
-    with pool.connection() as conn:
+def get_streaming_conn(
+    pool: ConnectionPool = Depends(get_pool),
+    deadline: Deadline = Depends(get_deadline),
+) -> Connection:
+    with connection(pool, deadline, limit_statements=False) as conn:
         yield conn
 
 
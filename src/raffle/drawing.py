@@ -0,0 +1,56 @@
+"""Draw the winning tickets of a raffle.
+
+This is shared by the synchronous draw endpoint and the draw job worker, so
+the checks that must hold while the winners are written live here rather than
+in either caller.
+"""
+import random
+
+import psycopg
+
+from . import db
+
+
+class DrawError(Exception):
+    """The winners of the raffle cannot be drawn."""
+
+
+def draw_winners(conn: psycopg.Connection, raffle) -> list[tuple[int, str]]:
+    """Assign each prize to a random ticket and return the winning numbers.
+
+    The raffle is only closed if its winners have not been drawn yet, so even
+    concurrent draws of the same raffle assign the prizes exactly once.
+    """
+    prizes = [
+        prize
+        for template in db.queries.list_prizes(conn, raffle_id=raffle.raffle_id)
+        for prize in [template] * template.amount
+    ]
+
+    if len(prizes) > raffle.total_tickets:
+        raise DrawError("More prizes than tickets")
+
+    # Using random.sample not random.choices because a single ticket may not win
+    # multiple prizes
+    winning_numbers = random.sample(range(1, raffle.total_tickets + 1), k=len(prizes))
+
+    with db.pipeline(conn):
+        if db.queries.close_raffle(conn, raffle_id=raffle.raffle_id) is None:
+            raise DrawError("Winners already drawn")
+
+        db.queries.assign_winners(
+            conn,
+            [
+                {
+                    "raffle_id": raffle.raffle_id,
+                    "ticket_number": ticket_number,
+                    "prize_id": prize.prize_id,
+                }
+                for prize, ticket_number in zip(prizes, winning_numbers)
+            ],
+        )
+
+    return [
+        (ticket_number, prize.name)
+        for prize, ticket_number in zip(prizes, winning_numbers)
+    ]
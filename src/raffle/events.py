@@ -0,0 +1,155 @@
+"""Push raffle updates to clients from a single database listener per worker.
+
+A trigger on `raffles` sends a notification on the `raffle_updates` channel
+when a raffle sells out or its winners are drawn. Each worker holds one
+connection listening on that channel for as long as any client is subscribed,
+and on the same connection polls the remaining tickets of every subscribed
+raffle once per interval. Both are fanned out to the subscribers of each
+raffle. With the memory backend the store announces the same updates as the
+trigger and the store is polled in the same way.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+
+import psycopg
+
+from . import db
+from .memory import Connection, Store
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "raffle_updates"
+
+# Seconds to wait before reconnecting after losing the listener connection
+RECONNECT_DELAY = 1
+
+
+class RaffleEvents:
+    """Fan out raffle update notifications to the subscribers of each raffle.
+
+    Subscribers receive a queue holding at most one update. A newer update
+    replaces one that has not been consumed yet, so slow clients only ever
+    see the latest state of the raffle instead of a growing backlog.
+    """
+
+    def __init__(self, db_url: str, interval: float, store: Store | None = None):
+        self.db_url = db_url
+        self.interval = interval
+        self.store = store
+        self._subscribers: dict[uuid.UUID, set[asyncio.Queue]] = defaultdict(set)
+        self._latest: dict[uuid.UUID, dict] = {}
+        self._listener: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+
+    def subscribe(self, raffle_id: uuid.UUID) -> asyncio.Queue:
+        if self._listener is None or self._listener.done():
+            self._ready = asyncio.Event()
+            self._listener = asyncio.create_task(
+                self._listen() if self.store is None else self._follow(self.store)
+            )
+
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers[raffle_id].add(queue)
+        return queue
+
+    async def ready(self):
+        """Wait until updates made from now on are sure to be published."""
+        await self._ready.wait()
+
+    def unsubscribe(self, raffle_id: uuid.UUID, queue: asyncio.Queue):
+        self._subscribers[raffle_id].discard(queue)
+
+        if not self._subscribers[raffle_id]:
+            del self._subscribers[raffle_id]
+            self._latest.pop(raffle_id, None)
+
+        if not self._subscribers and self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    def publish(self, update: dict):
+        for queue in self._subscribers.get(uuid.UUID(update["raffle_id"]), ()):
+            if queue.full():
+                queue.get_nowait()
+
+            queue.put_nowait(update)
+
+    def _refresh(self, update: dict):
+        """Publish an update unless it was the last one seen for its raffle."""
+        raffle_id = uuid.UUID(update["raffle_id"])
+
+        if self._latest.get(raffle_id) != update:
+            self._latest[raffle_id] = update
+            self.publish(update)
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.db_url, autocommit=True
+                ) as conn:
+                    # Notifications are handled as they arrive with the results
+                    # of each poll, so they wait at most one interval
+                    conn.add_notify_handler(
+                        lambda notify: self._refresh(json.loads(notify.payload))
+                    )
+                    await conn.execute(f"listen {CHANNEL}")
+                    self._ready.set()
+
+                    while True:
+                        await self._poll(conn)
+                        await asyncio.sleep(self.interval)
+            except psycopg.Error:
+                logger.exception("Lost connection listening for raffle updates")
+            finally:
+                self._ready.clear()
+
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _poll(self, conn: psycopg.AsyncConnection):
+        """Publish the remaining tickets of every subscribed raffle."""
+        if not self._subscribers:
+            return
+
+        cursor = await conn.execute(
+            db.queries.list_raffle_updates.sql, {"raffle_ids": list(self._subscribers)}
+        )
+        self._refresh_rows(await cursor.fetchall())
+
+    def _refresh_rows(self, rows: list[tuple]):
+        for raffle_id, available_tickets, winners_drawn in rows:
+            self._refresh(
+                {
+                    "raffle_id": str(raffle_id),
+                    "available_tickets": available_tickets,
+                    "winners_drawn": winners_drawn,
+                }
+            )
+
+    async def _follow(self, store: Store):
+        """Publish the updates of a memory store until cancelled."""
+        loop = asyncio.get_running_loop()
+
+        # Stores announce updates from the threads that make them
+        def notify(update: dict):
+            loop.call_soon_threadsafe(self._refresh, update)
+
+        store.listeners.add(notify)
+        self._ready.set()
+        conn = Connection(store)
+
+        try:
+            while True:
+                if self._subscribers:
+                    self._refresh_rows(
+                        db.queries.list_raffle_updates(
+                            conn, raffle_ids=list(self._subscribers)
+                        )
+                    )
+
+                await asyncio.sleep(self.interval)
+        finally:
+            store.listeners.discard(notify)
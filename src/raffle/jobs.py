@@ -0,0 +1,62 @@
+"""Run the draw jobs queued by managers outside of the HTTP request.
+
+Each job is locked with `skip locked` and drawn within the same transaction
+that marks it as finished, so any number of workers may run side by side and
+a worker that dies part way through leaves the job pending for another one.
+A job that fails with a database error is rolled back and marked as failed,
+so that it cannot hold up the jobs queued behind it.
+"""
+import time
+
+import psycopg
+
+from . import db, drawing
+
+
+def run_next_draw_job(conn: psycopg.Connection) -> bool:
+    """Run the oldest pending draw job and return whether there was one."""
+    raffle_id = None
+
+    try:
+        with conn.transaction():
+            raffle_id = db.queries.lock_pending_draw_job(conn)
+
+            if raffle_id is None:
+                return False
+
+            raffle = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+            try:
+                drawing.draw_winners(conn, raffle)
+            except drawing.DrawError as exc:
+                db.queries.finish_draw_job(
+                    conn, raffle_id=raffle_id, status="failed", error=str(exc)
+                )
+            else:
+                db.queries.finish_draw_job(
+                    conn, raffle_id=raffle_id, status="done", error=None
+                )
+    except psycopg.Error as exc:
+        # Without a job or a connection there is nothing left to record
+        if raffle_id is None or conn.closed:
+            raise
+
+        # The job was unlocked by the rollback, so this only marks it failed
+        # if no other worker has finished it in the meantime
+        with conn.transaction():
+            db.queries.finish_draw_job(
+                conn, raffle_id=raffle_id, status="failed", error=str(exc)
+            )
+
+    return True
+
+
+def run_draw_worker(conn: psycopg.Connection, poll_interval: float):
+    """Run draw jobs forever, waiting `poll_interval` seconds when idle.
+
+    Errors that lose the connection stop the worker, leaving the job being run
+    pending until the worker is restarted.
+    """
+    while True:
+        if not run_next_draw_job(conn):
+            time.sleep(poll_interval)
@@ -0,0 +1,807 @@
+"""Keep raffles in process memory behind the same named queries as Postgres.
+
+Selected with `db_backend=memory`, this takes the database out of the request
+path, so that benchmarks measure the ceiling of the HTTP layer alone and the
+tests can run without a database. Each named query is a method of `Store`
+taking the same parameters, which `db.queries` calls in place of the SQL
+whenever it is given a memory `Connection`.
+
+The constraints the endpoints rely on still hold. A ticket and an ip address
+can each be claimed once per raffle, with `UniqueViolation` raised like the
+database would, available tickets never go below zero and the winners are only
+drawn once. Every query holds the lock of the raffle it is about and a
+transaction holds the locks it took until the block ends, like row locks, so
+transactions on different raffles run side by side. Rows shared by every
+raffle are kept behind a lock of the store. Writes made before an
+error in a transaction are not rolled back, as the app only runs statements
+that may fail first in their transaction.
+
+Stores live in the process, one per database url, so a server with several
+worker processes does not share its raffles between them.
+"""
+import collections
+import contextlib
+import dataclasses
+import datetime
+import functools
+import hashlib
+import hmac
+import itertools
+import logging
+import random
+import secrets
+import threading
+import uuid
+from typing import Callable, Iterator
+
+import psycopg.errors
+from psycopg.pq import DiagnosticField
+
+logger = logging.getLogger(__name__)
+
+FetchRaffleRow = collections.namedtuple(
+    "FetchRaffleRow",
+    "raffle_id name total_tickets available_tickets winners_drawn opens_at"
+    " waiting_room prizes",
+)
+ListRaffleRow = collections.namedtuple(
+    "ListRaffleRow", FetchRaffleRow._fields + ("created_at",)
+)
+TicketRow = collections.namedtuple("TicketRow", "ticket_number")
+PrizeRow = collections.namedtuple("PrizeRow", "prize_id raffle_id name amount")
+WinnerRow = collections.namedtuple("WinnerRow", "ticket_number prize")
+ValidityRow = collections.namedtuple("ValidityRow", "raffle_id ticket_number is_valid")
+PrizeNameRow = collections.namedtuple("PrizeNameRow", "prize")
+ExportRow = collections.namedtuple("ExportRow", "ticket_number ip_address prize")
+ParticipantTicketRow = collections.namedtuple(
+    "ParticipantTicketRow",
+    "raffle_id name ticket_number claimed_at winners_drawn prize",
+)
+AnalyticsRow = collections.namedtuple(
+    "AnalyticsRow",
+    "raffle_id created_at opened_at sold_out_at total_tickets available_tickets",
+)
+RaffleUpdateRow = collections.namedtuple(
+    "RaffleUpdateRow", "raffle_id available_tickets winners_drawn"
+)
+RollupRow = collections.namedtuple("RollupRow", "bucket claims")
+DrawJobRow = collections.namedtuple("DrawJobRow", "raffle_id status error")
+QueueEntryRow = collections.namedtuple("QueueEntryRow", "position admitted_position")
+RaffleIdRow = collections.namedtuple("RaffleIdRow", "raffle_id")
+
+# Parameters of the named queries that hold a uuid
+UUID_PARAMETERS = {"after_raffle", "raffle_id"}
+
+
+def _unique_violation(constraint: str) -> psycopg.errors.UniqueViolation:
+    """Return the error the database raises for a duplicate key."""
+    return psycopg.errors.UniqueViolation(
+        f'duplicate key value violates unique constraint "{constraint}"',
+        info={DiagnosticField.CONSTRAINT_NAME: constraint.encode()},
+    )
+
+
+def hash_code(code: str, salt: str | None = None) -> str:
+    """Hash a verification code with a random salt, in place of crypt."""
+    salt = secrets.token_hex(8) if salt is None else salt
+    return f"{salt}${hashlib.sha256((salt + code).encode()).hexdigest()}"
+
+
+def check_code(code: str, hashed: str) -> bool:
+    salt, _ = hashed.split("$", 1)
+    return hmac.compare_digest(hash_code(code, salt), hashed)
+
+
+@dataclasses.dataclass
+class Participant:
+    ticket_number: int
+    ip_address: str
+    verification_code: str
+    claimed_at: datetime.datetime
+    prize_id: int | None = None
+
+
+@dataclasses.dataclass
+class Raffle:
+    raffle_id: uuid.UUID
+    name: str
+    total_tickets: int
+    available_tickets: int
+    opens_at: datetime.datetime | None
+    waiting_room: bool
+    created_at: datetime.datetime = dataclasses.field(
+        default_factory=datetime.datetime.now
+    )
+    sold_out_at: datetime.datetime | None = None
+    winners_drawn: bool = False
+    drawn_at: datetime.datetime | None = None
+    archived: bool = False
+    prize_ids: list[int] = dataclasses.field(default_factory=list)
+    # Ticket numbers in the order they are handed out, and the index before
+    # which every ticket has been claimed
+    tickets: list[int] = dataclasses.field(default_factory=list)
+    next_ticket: int = 0
+    participants: dict[int, Participant] = dataclasses.field(default_factory=dict)
+    ip_addresses: dict[str, int] = dataclasses.field(default_factory=dict)
+    winners: dict[int, int] = dataclasses.field(default_factory=dict)
+    archived_participants: dict[int, Participant] = dataclasses.field(
+        default_factory=dict
+    )
+    archived_ip_addresses: dict[str, int] = dataclasses.field(default_factory=dict)
+    claim_rollups: dict[datetime.datetime, int] = dataclasses.field(
+        default_factory=dict
+    )
+    queue: dict[str, int] = dataclasses.field(default_factory=dict)
+    lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, repr=False, compare=False
+    )
+
+
+@dataclasses.dataclass
+class Prize:
+    prize_id: int
+    raffle_id: uuid.UUID
+    name: str
+    amount: int
+
+
+@dataclasses.dataclass
+class DrawJob:
+    raffle_id: uuid.UUID
+    created_at: datetime.datetime = dataclasses.field(
+        default_factory=datetime.datetime.now
+    )
+    finished_at: datetime.datetime | None = None
+    status: str = "pending"
+    error: str | None = None
+
+
+class Store:
+    """The tables of a database, with a method for each of its named queries.
+
+    Raffles and draw jobs are kept in order of creation, and everything else
+    belonging to a raffle is kept on it, so most queries are a lookup by id.
+    Prizes and the raffles of each ip address are shared, so they are changed
+    under the lock of the store.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.listeners: set[Callable[[dict], None]] = set()
+        # The raffle locks each thread holds until its statement or
+        # transaction ends
+        self.held = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Drop every row, as both migrations do."""
+        with self.lock:
+            self.raffles: dict[uuid.UUID, Raffle] = {}
+            self.prizes: dict[int, Prize] = {}
+            self.draw_jobs: dict[uuid.UUID, DrawJob] = {}
+            self.ip_address_raffles: dict[
+                str, set[uuid.UUID]
+            ] = collections.defaultdict(set)
+            self.last_prize_id = 0
+            # Queue entries are numbered across every raffle, like an identity
+            self.entry_ids = itertools.count(1)
+
+    @contextlib.contextmanager
+    def locking(self) -> Iterator[None]:
+        """Keep the raffle locks taken in the block until it ends."""
+        if getattr(self.held, "locks", None) is not None:
+            yield
+            return
+
+        self.held.locks = []
+
+        try:
+            yield
+        finally:
+            for lock in reversed(self.held.locks):
+                lock.release()
+
+            self.held.locks = None
+
+    def hold_raffle(self, raffle_id: uuid.UUID, blocking: bool = True) -> bool:
+        """Lock a raffle until the block of `locking` ends, if it exists."""
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None or not raffle.lock.acquire(blocking):
+            return False
+
+        self.held.locks.append(raffle.lock)
+        return True
+
+    def _raffle(self, raffle_id: uuid.UUID, table: str) -> Raffle:
+        """Return a raffle that rows of the table are about to refer to."""
+        try:
+            return self.raffles[raffle_id]
+        except KeyError:
+            raise psycopg.errors.ForeignKeyViolation(
+                f'insert or update on table "{table}" violates foreign key'
+                f' constraint "{table}_raffle_id_fkey"'
+            )
+
+    def _notify(self, raffle: Raffle):
+        update = {
+            "raffle_id": str(raffle.raffle_id),
+            "available_tickets": raffle.available_tickets,
+            "winners_drawn": raffle.winners_drawn,
+        }
+
+        # A failing listener must not fail the change that it is told about
+        for listener in list(self.listeners):
+            try:
+                listener(update)
+            except Exception:
+                logger.exception("Failed to announce raffle update")
+
+    def _opened_at(self, raffle: Raffle) -> datetime.datetime:
+        if raffle.opens_at is None:
+            return raffle.created_at
+
+        # Like the database, times without a timezone are local
+        opens_at = raffle.opens_at.astimezone().replace(tzinfo=None)
+        return max(raffle.created_at, opens_at)
+
+    def _prizes(self, raffle: Raffle) -> list[dict] | None:
+        prizes = [self.prizes[prize_id] for prize_id in raffle.prize_ids]
+        return [{"name": p.name, "amount": p.amount} for p in prizes] or None
+
+    def _prize_name(self, prize_id: int | None) -> str | None:
+        return None if prize_id is None else self.prizes[prize_id].name
+
+    # create_raffle.sql
+
+    def create_raffle(self, raffle_id, name, total_tickets, opens_at, waiting_room):
+        raffle = Raffle(
+            raffle_id=raffle_id,
+            name=name,
+            total_tickets=total_tickets,
+            available_tickets=total_tickets,
+            opens_at=opens_at,
+            waiting_room=waiting_room,
+        )
+
+        # Nothing is locked yet, so the insert itself decides who was first
+        if self.raffles.setdefault(raffle_id, raffle) is not raffle:
+            raise _unique_violation("raffles_pkey")
+
+        self.hold_raffle(raffle_id)
+
+    def create_tickets(self, raffle_id, total_tickets):
+        raffle = self._raffle(raffle_id, "tickets")
+        raffle.tickets = random.sample(range(1, total_tickets + 1), total_tickets)
+        raffle.next_ticket = 0
+
+    def create_prizes(self, raffle_id, name, amount):
+        raffle = self._raffle(raffle_id, "prizes")
+
+        with self.lock:
+            self.last_prize_id += 1
+            prize_id = self.last_prize_id
+            self.prizes[prize_id] = Prize(prize_id, raffle_id, name, amount)
+
+        raffle.prize_ids.append(prize_id)
+
+    # fetch_raffle.sql and list_raffles.sql
+
+    def fetch_raffle(self, raffle_id):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return None
+
+        return FetchRaffleRow(
+            raffle_id=raffle.raffle_id,
+            name=raffle.name,
+            total_tickets=raffle.total_tickets,
+            available_tickets=raffle.available_tickets,
+            winners_drawn=raffle.winners_drawn,
+            opens_at=raffle.opens_at,
+            waiting_room=raffle.waiting_room,
+            prizes=self._prizes(raffle),
+        )
+
+    def list_raffle_updates(self, raffle_ids):
+        raffles = [self.raffles[r] for r in raffle_ids if r in self.raffles]
+
+        return [
+            RaffleUpdateRow(
+                raffle_id=raffle.raffle_id,
+                available_tickets=raffle.available_tickets,
+                winners_drawn=raffle.winners_drawn,
+            )
+            for raffle in raffles
+        ]
+
+    def list_raffles(self, limit):
+        rows = []
+
+        for raffle in reversed(list(self.raffles.values())):
+            if len(rows) == limit:
+                break
+
+            rows.append(
+                ListRaffleRow(
+                    *self.fetch_raffle(raffle.raffle_id), created_at=raffle.created_at
+                )
+            )
+
+        return rows
+
+    # participate_raffle.sql
+
+    def has_ip_address_participated(self, raffle_id, ip_address):
+        raffle = self.raffles.get(raffle_id)
+        return raffle is not None and ip_address in raffle.ip_addresses
+
+    def fetch_ticket_pool(self, raffle_id, limit):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return []
+
+        tickets = raffle.tickets
+
+        # Claimed tickets at the front of the order are skipped for good
+        while (
+            raffle.next_ticket < len(tickets)
+            and tickets[raffle.next_ticket] in raffle.participants
+        ):
+            raffle.next_ticket += 1
+
+        pool = []
+
+        for index in range(raffle.next_ticket, len(tickets)):
+            if len(pool) == limit:
+                break
+
+            if tickets[index] not in raffle.participants:
+                pool.append(TicketRow(tickets[index]))
+
+        return pool
+
+    def claim_ticket(
+        self, raffle_id, ticket_number, ip_address, verification_code, crypt_algorithm
+    ):
+        raffle = self._raffle(raffle_id, "participants")
+
+        if not raffle.tickets or not 0 < ticket_number <= raffle.total_tickets:
+            raise psycopg.errors.ForeignKeyViolation(
+                'insert or update on table "participants" violates foreign key'
+                ' constraint "participants_raffle_id_ticket_number_fkey"'
+            )
+
+        if ticket_number in raffle.participants:
+            raise _unique_violation("participants_pkey")
+
+        if ip_address in raffle.ip_addresses:
+            raise _unique_violation("participants_raffle_id_ip_address_key")
+
+        raffle.participants[ticket_number] = Participant(
+            ticket_number=ticket_number,
+            ip_address=ip_address,
+            verification_code=hash_code(verification_code),
+            claimed_at=datetime.datetime.now(),
+        )
+        raffle.ip_addresses[ip_address] = ticket_number
+
+        with self.lock:
+            self.ip_address_raffles[ip_address].add(raffle_id)
+
+    def release_ticket(self, raffle_id):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return
+
+        if raffle.available_tickets == 0:
+            raise psycopg.errors.CheckViolation(
+                'new row for relation "raffles" violates check constraint'
+                ' "raffles_check1"'
+            )
+
+        raffle.sold_out_at = (
+            datetime.datetime.now() if raffle.available_tickets == 1 else None
+        )
+        raffle.available_tickets -= 1
+
+        # Like the trigger, only selling out is announced, as polling covers
+        # every other claim
+        if raffle.available_tickets == 0:
+            self._notify(raffle)
+
+    # draw_winners.sql
+
+    def list_prizes(self, raffle_id):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return []
+
+        return [
+            PrizeRow(**dataclasses.asdict(self.prizes[prize_id]))
+            for prize_id in raffle.prize_ids
+        ]
+
+    def close_raffle(self, raffle_id):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None or raffle.winners_drawn:
+            return None
+
+        raffle.winners_drawn = True
+        raffle.drawn_at = datetime.datetime.now()
+        self._notify(raffle)
+        return raffle_id
+
+    def assign_winners(self, raffle_id, ticket_number, prize_id):
+        raffle = self._raffle(raffle_id, "winners")
+
+        if ticket_number not in raffle.participants or prize_id not in self.prizes:
+            raise psycopg.errors.ForeignKeyViolation(
+                'insert or update on table "winners" violates foreign key'
+                ' constraint "winners_raffle_id_ticket_number_fkey"'
+            )
+
+        if ticket_number in raffle.winners:
+            raise _unique_violation("winners_pkey")
+
+        raffle.winners[ticket_number] = prize_id
+
+    # list_winners.sql
+
+    def _winners(self, raffle: Raffle) -> Iterator[tuple[int, int]]:
+        yield from raffle.winners.items()
+
+        for participant in raffle.archived_participants.values():
+            if participant.prize_id is not None:
+                yield participant.ticket_number, participant.prize_id
+
+    def list_winners(self, raffle_id, after_ticket, limit):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return []
+
+        winners = sorted(
+            (ticket_number, prize_id)
+            for ticket_number, prize_id in self._winners(raffle)
+            if ticket_number > after_ticket
+        )
+
+        return [
+            WinnerRow(ticket_number, self._prize_name(prize_id))
+            for ticket_number, prize_id in winners[:limit]
+        ]
+
+    def fetch_winner(self, raffle_id, ticket_number):
+        participant = self._participant(raffle_id, ticket_number)
+
+        if participant is None or participant.prize_id is None:
+            return None
+
+        return WinnerRow(ticket_number, self._prize_name(participant.prize_id))
+
+    # verify_ticket.sql
+
+    def _participant(self, raffle_id, ticket_number) -> Participant | None:
+        """Return a live or archived participant, with any prize they won."""
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return None
+
+        participant = raffle.participants.get(ticket_number)
+
+        if participant is not None:
+            return dataclasses.replace(
+                participant, prize_id=raffle.winners.get(ticket_number)
+            )
+
+        return raffle.archived_participants.get(ticket_number)
+
+    def fetch_ticket_with_validity(self, raffle_id, ticket_number, verification_code):
+        participant = self._participant(raffle_id, ticket_number)
+
+        if participant is None:
+            return None
+
+        return ValidityRow(
+            raffle_id=raffle_id,
+            ticket_number=ticket_number,
+            is_valid=check_code(verification_code, participant.verification_code),
+        )
+
+    def fetch_prize(self, raffle_id, ticket_number):
+        participant = self._participant(raffle_id, ticket_number)
+
+        if participant is None:
+            return None
+
+        return PrizeNameRow(self._prize_name(participant.prize_id))
+
+    # export_raffle.sql
+
+    def export_participants(self, raffle_id):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return []
+
+        participants = sorted(
+            [*raffle.participants.values(), *raffle.archived_participants.values()],
+            key=lambda participant: participant.ticket_number,
+        )
+
+        return [
+            ExportRow(
+                ticket_number=participant.ticket_number,
+                ip_address=participant.ip_address,
+                prize=self._prize_name(
+                    participant.prize_id
+                    or raffle.winners.get(participant.ticket_number)
+                ),
+            )
+            for participant in participants
+        ]
+
+    # list_tickets.sql
+
+    def list_participant_tickets(self, ip_address, after_raffle, limit):
+        with self.lock:
+            raffle_ids = sorted(
+                raffle_id
+                for raffle_id in self.ip_address_raffles.get(ip_address, ())
+                if raffle_id > after_raffle
+            )
+        rows = []
+
+        for raffle_id in raffle_ids[:limit]:
+            raffle = self.raffles[raffle_id]
+            ticket_number = raffle.ip_addresses.get(
+                ip_address, raffle.archived_ip_addresses.get(ip_address)
+            )
+            participant = self._participant(raffle_id, ticket_number)
+            rows.append(
+                ParticipantTicketRow(
+                    raffle_id=raffle_id,
+                    name=raffle.name,
+                    ticket_number=ticket_number,
+                    claimed_at=participant.claimed_at,
+                    winners_drawn=raffle.winners_drawn,
+                    prize=self._prize_name(participant.prize_id),
+                )
+            )
+
+        return rows
+
+    # compact_raffle.sql
+
+    def lock_compactable_raffle(self, min_age):
+        drawn_before = datetime.datetime.now() - datetime.timedelta(seconds=min_age)
+
+        for raffle in list(self.raffles.values()):
+            if (
+                raffle.winners_drawn
+                and not raffle.archived
+                and raffle.drawn_at <= drawn_before
+                and self.hold_raffle(raffle.raffle_id, blocking=False)
+                and not raffle.archived
+            ):
+                return raffle.raffle_id
+
+        return None
+
+    def archive_participants(self, raffle_id):
+        raffle = self._raffle(raffle_id, "archived_participants")
+
+        for ticket_number in raffle.participants:
+            if ticket_number in raffle.archived_participants:
+                raise _unique_violation("archived_participants_pkey")
+
+        for ticket_number, participant in raffle.participants.items():
+            raffle.archived_participants[ticket_number] = dataclasses.replace(
+                participant, prize_id=raffle.winners.get(ticket_number)
+            )
+            raffle.archived_ip_addresses[participant.ip_address] = ticket_number
+
+    def delete_winners(self, raffle_id):
+        if raffle_id in self.raffles:
+            self.raffles[raffle_id].winners.clear()
+
+    def delete_participants(self, raffle_id):
+        if raffle_id in self.raffles:
+            self.raffles[raffle_id].participants.clear()
+            self.raffles[raffle_id].ip_addresses.clear()
+
+    def delete_tickets(self, raffle_id):
+        if raffle_id in self.raffles:
+            self.raffles[raffle_id].tickets = []
+            self.raffles[raffle_id].next_ticket = 0
+
+    def delete_queue_entries(self, raffle_id):
+        if raffle_id in self.raffles:
+            self.raffles[raffle_id].queue.clear()
+
+    def archive_raffle(self, raffle_id):
+        if raffle_id in self.raffles:
+            self.raffles[raffle_id].archived = True
+
+    # draw_jobs.sql
+
+    def create_draw_job(self, raffle_id):
+        self._raffle(raffle_id, "draw_jobs")
+        self.draw_jobs.setdefault(raffle_id, DrawJob(raffle_id))
+
+    def fetch_draw_job(self, raffle_id):
+        job = self.draw_jobs.get(raffle_id)
+
+        if job is None:
+            return None
+
+        return DrawJobRow(job.raffle_id, job.status, job.error)
+
+    def lock_pending_draw_job(self):
+        for job in list(self.draw_jobs.values()):
+            if (
+                job.status == "pending"
+                and self.hold_raffle(job.raffle_id, blocking=False)
+                and job.status == "pending"
+            ):
+                return job.raffle_id
+
+        return None
+
+    def finish_draw_job(self, raffle_id, status, error):
+        job = self.draw_jobs.get(raffle_id)
+
+        if job is not None and job.status == "pending":
+            job.status = status
+            job.error = error
+            job.finished_at = datetime.datetime.now()
+
+    # raffle_analytics.sql
+
+    def record_claim(self, raffle_id):
+        raffle = self._raffle(raffle_id, "claim_rollups")
+        bucket = datetime.datetime.now().replace(second=0, microsecond=0)
+        raffle.claim_rollups[bucket] = raffle.claim_rollups.get(bucket, 0) + 1
+
+    def fetch_raffle_analytics(self, raffle_id):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return None
+
+        return AnalyticsRow(
+            raffle_id=raffle.raffle_id,
+            created_at=raffle.created_at,
+            opened_at=self._opened_at(raffle),
+            sold_out_at=raffle.sold_out_at,
+            total_tickets=raffle.total_tickets,
+            available_tickets=raffle.available_tickets,
+        )
+
+    def list_claim_rollups(self, raffle_id):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return []
+
+        return [RollupRow(*rollup) for rollup in sorted(raffle.claim_rollups.items())]
+
+    # prewarm_raffle.sql
+
+    def list_opening_raffles(self, lead):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        until = now + datetime.timedelta(seconds=lead)
+
+        return [
+            RaffleIdRow(raffle.raffle_id)
+            for raffle in list(self.raffles.values())
+            if raffle.opens_at is not None and now < raffle.opens_at <= until
+        ]
+
+    def prewarm_tickets(self, raffle_id):
+        # Tickets are already in memory, so they are only counted
+        raffle = self.raffles.get(raffle_id)
+        return len(raffle.tickets) if raffle is not None and raffle.tickets else None
+
+    # waiting_room.sql
+
+    def join_queue(self, raffle_id, ip_address):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None:
+            return None
+
+        if ip_address not in raffle.queue:
+            raffle.queue[ip_address] = next(self.entry_ids)
+
+    def fetch_queue_entry(self, raffle_id, ip_address, window):
+        raffle = self.raffles.get(raffle_id)
+
+        if raffle is None or ip_address not in raffle.queue:
+            return None
+
+        now = datetime.datetime.now()
+        minute = datetime.timedelta(minutes=1)
+        since = now.replace(second=0, microsecond=0) - minute
+        recent = sum(
+            claims for bucket, claims in raffle.claim_rollups.items() if bucket >= since
+        )
+        minutes = max(0, (now - self._opened_at(raffle)) // minute)
+        claimed = raffle.total_tickets - raffle.available_tickets
+
+        # Entries are kept in order of their numbers, so the first is the lowest
+        first_entry_id = next(iter(raffle.queue.values()))
+
+        return QueueEntryRow(
+            position=raffle.queue[ip_address] - first_entry_id + 1,
+            admitted_position=max(claimed, window * minutes) + max(window, recent),
+        )
+
+
+class Connection:
+    """A connection to a store, standing in for a psycopg connection."""
+
+    # There is no server to lose the connection to
+    closed = False
+
+    def __init__(self, store: Store):
+        self.store = store
+
+    def __enter__(self) -> "Connection":
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def run(self, query_name: str, parameters: dict | tuple):
+        # Queries without parameters are given an empty tuple, and ids may be
+        # given as strings that Postgres would have cast
+        parameters = {
+            name: (
+                uuid.UUID(value)
+                if name in UUID_PARAMETERS and isinstance(value, str)
+                else value
+            )
+            for name, value in dict(parameters or {}).items()
+        }
+
+        with self.store.locking():
+            if "raffle_id" in parameters:
+                self.store.hold_raffle(parameters["raffle_id"])
+
+            return getattr(self.store, query_name)(**parameters)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self.store.locking():
+            yield
+
+    def pipeline(self) -> contextlib.nullcontext:
+        return contextlib.nullcontext()
+
+
+class Pool:
+    """Hand out connections to a store, however many are asked for at once."""
+
+    def __init__(self, store: Store):
+        self.store = store
+
+    @contextlib.contextmanager
+    def connection(self, timeout: float | None = None) -> Iterator[Connection]:
+        yield Connection(self.store)
+
+    def check(self):
+        pass
+
+
+@functools.cache
+def get_store(db_url: str) -> Store:
+    """Return the store standing in for the database at the url."""
+    return Store()
@@ -1,4 +1,12 @@
 -- name: delete_schema#
+drop table if exists claim_rollups cascade;
+
+drop table if exists queue_entries cascade;
+
+drop table if exists draw_jobs cascade;
+
+drop table if exists archived_participants cascade;
+
 drop table if exists winners cascade;
 
 drop table if exists participants cascade;
@@ -9,4 +17,6 @@ drop table if exists prizes cascade;
 
 drop table if exists raffles cascade;
 
+drop function if exists notify_raffle_update cascade;
+
 drop extension if exists pgcrypto;
@@ -4,14 +4,24 @@ create extension pgcrypto;
 create table raffles (
   raffle_id uuid not null default gen_random_uuid () primary key,
   created_at timestamp not null default now(),
+  opens_at timestamptz,
   name varchar(100) not null,
   total_tickets integer not null,
   available_tickets integer not null,
+  sold_out_at timestamp,
   winners_drawn bool not null default false,
+  drawn_at timestamp,
+  archived bool not null default false,
+  waiting_room bool not null default false,
   check (0 < total_tickets),
   check (0 <= available_tickets and available_tickets <= total_tickets)
 );
 
+-- Raffles about to open are looked up so they can be warmed ahead of the sale.
+create index opening_raffles_idx on raffles (opens_at)
+where
+  opens_at is not null;
+
 create table prizes (
   prize_id serial primary key,
   raffle_id uuid not null references raffles on delete cascade,
@@ -26,17 +36,22 @@ create table tickets (
   ticket_order float not null default random(),
   check (0 < ticket_number),
   primary key (raffle_id, ticket_number)
-);
+)
+partition by hash (raffle_id);
 
 create table participants (
   raffle_id uuid not null references raffles on delete restrict,
   ticket_number integer not null,
   ip_address inet not null,
   verification_code varchar(128) not null,
+  claimed_at timestamp not null default now(),
   foreign key (raffle_id, ticket_number) references tickets,
   primary key (raffle_id, ticket_number),
   unique (raffle_id, ip_address)
-);
+)
+partition by hash (raffle_id);
+
+create index participants_ip_address_idx on participants (ip_address, raffle_id);
 
 create table winners (
   raffle_id uuid not null references raffles on delete restrict,
@@ -45,4 +60,95 @@ create table winners (
   foreign key (raffle_id, ticket_number) references participants,
   foreign key (raffle_id, ticket_number) references tickets,
   primary key (raffle_id, ticket_number)
+)
+partition by hash (raffle_id);
+
+-- Claims counted per raffle and minute as they happen, so that sales analytics
+-- never need to scan the participants table.
+create table claim_rollups (
+  raffle_id uuid not null references raffles on delete cascade,
+  bucket timestamp not null,
+  claims integer not null,
+  primary key (raffle_id, bucket)
+);
+
+-- Places in the waiting room of a raffle, one per ip address. Entries are
+-- numbered from an identity column in order of arrival, so joining never
+-- touches the raffle itself, and placed by that number within their raffle.
+create table queue_entries (
+  entry_id bigint generated always as identity,
+  raffle_id uuid not null references raffles on delete cascade,
+  ip_address inet not null,
+  primary key (raffle_id, ip_address)
+);
+
+create index queue_entries_order_idx on queue_entries (raffle_id, entry_id);
+
+-- Draws requested to run in the background, at most one per raffle.
+create table draw_jobs (
+  raffle_id uuid not null primary key references raffles on delete cascade,
+  created_at timestamp not null default now(),
+  finished_at timestamp,
+  status varchar(20) not null default 'pending',
+  error text,
+  check (status in ('pending', 'done', 'failed'))
 );
+
+create index pending_draw_jobs_idx on draw_jobs (created_at)
+where
+  status = 'pending';
+
+-- Participants of drawn raffles are moved here by compaction so the per-ticket
+-- tables above only hold live raffles.
+create table archived_participants (
+  raffle_id uuid not null references raffles on delete restrict,
+  ticket_number integer not null,
+  ip_address inet not null,
+  verification_code varchar(128) not null,
+  claimed_at timestamp not null,
+  prize_id integer references prizes,
+  primary key (raffle_id, ticket_number)
+);
+
+create index archived_participants_ip_address_idx on archived_participants (ip_address, raffle_id);
+
+create index archived_winners_idx on archived_participants (raffle_id, ticket_number)
+where
+  prize_id is not null;
+
+-- The per-ticket tables are hash partitioned by raffle so that every query for
+-- a single raffle only touches one partition. The number of partitions is read
+-- from the "raffle.partitions" setting and defaults to a single partition.
+do $$
+declare
+  partitions integer := cast(coalesce(nullif(current_setting('raffle.partitions', true), ''), '1') as integer);
+  partitioned_table text;
+begin
+  foreach partitioned_table in array array['tickets', 'participants', 'winners'] loop
+    for i in 0..partitions - 1 loop
+      execute format('create table %I partition of %I for values with (modulus %s, remainder %s)', partitioned_table || '_' || i, partitioned_table, partitions, i);
+    end loop;
+  end loop;
+end
+$$;
+
+-- Announce when a raffle sells out or its winners are drawn so that workers
+-- can push them to subscribed clients. Other changes to the remaining tickets
+-- are polled for instead, as a notification on every claim would serialise
+-- their commits.
+create function notify_raffle_update ()
+  returns trigger
+  as $$
+begin
+  perform
+    pg_notify('raffle_updates', json_build_object('raffle_id', new.raffle_id, 'available_tickets', new.available_tickets, 'winners_drawn', new.winners_drawn)::text);
+  return new;
+end
+$$
+language plpgsql;
+
+create trigger raffle_updated
+  after update of available_tickets,
+  winners_drawn on raffles for each row
+  when ((new.available_tickets = 0 and old.available_tickets <> 0) or (new.winners_drawn and not old.winners_drawn))
+  execute function notify_raffle_update ();
@@ -0,0 +1,185 @@
+"""Profile individual requests on demand to see where their time is spent.
+
+Sync endpoints and dependencies run in a threadpool, so a deterministic
+profiler enabled around the request would only see the event loop. Instead the
+stacks of every busy thread are sampled while a profiled request is running.
+A sample counts towards the wall-clock profile and, when the thread used CPU
+time since its previous sample, towards the CPU profile too, which separates
+SQL and pool waits from pydantic or crypt work.
+
+Profiles are written to the configured directory in the folded stack format
+read by most flame graph tools. Samples are taken from the whole process, so
+concurrent requests show up in each other's profiles.
+"""
+import collections
+import datetime
+import inspect
+import logging
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from . import deps
+from .config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Header a manager sets to profile a single request
+PROFILE_HEADER = "x-profile"
+
+# Innermost frames of threads waiting for work rather than doing any
+IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select")}
+
+
+def format_frame(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def thread_cpu_time(thread_id: int) -> float | None:
+    """Return the CPU time used by a thread, if the platform can tell."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError):
+        return None
+
+
+class StackSampler:
+    """Count the stacks of busy threads at a fixed interval in the background."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.wall = collections.Counter()
+        self.cpu = collections.Counter()
+        self._cpu_times = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == threading.get_ident():
+                continue
+
+            if (Path(frame.f_code.co_filename).name, frame.f_code.co_name) in (
+                IDLE_FRAMES
+            ):
+                continue
+
+            stack = []
+
+            while frame is not None:
+                stack.append(format_frame(frame))
+                frame = frame.f_back
+
+            folded = ";".join(reversed(stack))
+            self.wall[folded] += 1
+
+            cpu_time = thread_cpu_time(thread_id)
+            previous = self._cpu_times.get(thread_id)
+            self._cpu_times[thread_id] = cpu_time
+
+            if cpu_time is not None and previous is not None and cpu_time > previous:
+                self.cpu[folded] += 1
+
+
+def should_profile(request: Request, settings: Settings) -> bool:
+    if PROFILE_HEADER in request.headers:
+        # Resolve the ip address the same way as the endpoints, where overrides
+        # may do without the request
+        get_ip_address = request.app.dependency_overrides.get(
+            deps.get_ip_address, deps.get_ip_address
+        )
+
+        if inspect.signature(get_ip_address).parameters:
+            ip_address = get_ip_address(request)
+        else:
+            ip_address = get_ip_address()
+
+        return ip_address in settings.manager_ip_addresses
+
+    return random.random() < settings.profile_sample_rate
+
+
+def write_profile(directory: Path, name: str, sampler: StackSampler) -> Path:
+    """Write the folded stacks of each profile to files starting with name."""
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for kind, counts in (("wall", sampler.wall), ("cpu", sampler.cpu)):
+        lines = (f"{stack} {count}\n" for stack, count in counts.most_common())
+        (directory / f"{name}.{kind}.folded").write_text("".join(lines))
+
+    return directory / name
+
+
+class ProfilingMiddleware:
+    """Profile requests from managers asking for it and a sample of the rest.
+
+    When profiling is off this costs a header lookup and a random number per
+    request. Profiles hold every thread of the process, not only the one
+    serving the request, so profile a request while the worker is otherwise
+    idle to see it alone.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Resolve the settings the same way as the endpoints, so that
+        # overrides apply here too
+        get_settings = scope["app"].dependency_overrides.get(
+            deps.get_settings, deps.get_settings
+        )
+        settings = get_settings()
+
+        if not should_profile(Request(scope), settings):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = datetime.datetime.now()
+        wall_time = time.perf_counter()
+        cpu_time = time.process_time()
+
+        with StackSampler(settings.profile_interval) as sampler:
+            await self.app(scope, receive, send)
+
+        wall_time = time.perf_counter() - wall_time
+        cpu_time = time.process_time() - cpu_time
+
+        # The router leaves the matched endpoint and path parameters in scope
+        endpoint = getattr(scope.get("endpoint"), "__name__", "unmatched")
+        raffle_id = scope.get("path_params", {}).get("raffle_id", "-")
+        name = f"{started_at:%Y%m%dT%H%M%S.%f}-{endpoint}-{raffle_id}"
+
+        path = await run_in_threadpool(
+            write_profile, settings.profile_dir, name, sampler
+        )
+        logger.info(
+            "Profiled %s %s in %.3fs wall and %.3fs process CPU to %s",
+            scope["method"],
+            scope["path"],
+            wall_time,
+            cpu_time,
+            path,
+        )
@@ -0,0 +1,54 @@
+-- name: lock_compactable_raffle$
+select
+  raffle_id
+from
+  raffles
+where
+  winners_drawn
+  and not archived
+  and drawn_at <= now() - make_interval(secs => :min_age)
+order by
+  created_at
+limit 1
+for update
+  skip locked;
+
+-- name: archive_participants!
+insert into archived_participants (raffle_id, ticket_number, ip_address, verification_code, claimed_at, prize_id)
+select
+  participants.raffle_id,
+  participants.ticket_number,
+  participants.ip_address,
+  participants.verification_code,
+  participants.claimed_at,
+  winners.prize_id
+from
+  participants
+  left join winners on winners.raffle_id = :raffle_id
+    and winners.ticket_number = participants.ticket_number
+where
+  participants.raffle_id = :raffle_id;
+
+-- name: delete_winners!
+delete from winners
+where raffle_id = :raffle_id;
+
+-- name: delete_participants!
+delete from participants
+where raffle_id = :raffle_id;
+
+-- name: delete_tickets!
+delete from tickets
+where raffle_id = :raffle_id;
+
+-- name: delete_queue_entries!
+delete from queue_entries
+where raffle_id = :raffle_id;
+
+-- name: archive_raffle!
+update
+  raffles
+set
+  archived = true
+where
+  raffle_id = :raffle_id;
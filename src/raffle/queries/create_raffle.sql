@@ -1,8 +1,6 @@
--- name: create_raffle<!
-insert into raffles (name, total_tickets, available_tickets)
-  values (:name, :total_tickets, :total_tickets)
-returning
-  raffle_id, name, total_tickets, available_tickets, winners_drawn;
+-- name: create_raffle!
+insert into raffles (raffle_id, name, total_tickets, available_tickets, opens_at, waiting_room)
+  values (:raffle_id, :name, :total_tickets, :total_tickets, :opens_at, :waiting_room);
 
 -- name: create_tickets!
 insert into tickets (raffle_id, ticket_number)
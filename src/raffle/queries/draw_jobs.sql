@@ -0,0 +1,39 @@
+-- name: create_draw_job!
+insert into draw_jobs (raffle_id)
+  values (:raffle_id)
+on conflict (raffle_id)
+  do nothing;
+
+-- name: fetch_draw_job^
+select
+  raffle_id,
+  status,
+  error
+from
+  draw_jobs
+where
+  raffle_id = :raffle_id;
+
+-- name: lock_pending_draw_job$
+select
+  raffle_id
+from
+  draw_jobs
+where
+  status = 'pending'
+order by
+  created_at
+limit 1
+for update
+  skip locked;
+
+-- name: finish_draw_job!
+update
+  draw_jobs
+set
+  status = :status,
+  error = :error,
+  finished_at = now()
+where
+  raffle_id = :raffle_id
+  and status = 'pending';
@@ -9,13 +9,17 @@ from
 where
   raffle_id = :raffle_id;
 
--- name: close_raffle!
+-- name: close_raffle<!
 update
   raffles
 set
-  winners_drawn = true
+  winners_drawn = true,
+  drawn_at = now()
 where
-  raffle_id = :raffle_id;
+  raffle_id = :raffle_id
+  and not winners_drawn
+returning
+  raffle_id;
 
 -- name: assign_winners*!
 insert into winners (raffle_id, ticket_number, prize_id)
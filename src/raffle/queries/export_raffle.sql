@@ -0,0 +1,24 @@
+-- name: export_participants
+select
+  participants.ticket_number,
+  participants.ip_address,
+  prizes.name as prize
+from
+  participants
+  left join winners on winners.raffle_id = :raffle_id
+    and winners.ticket_number = participants.ticket_number
+  left join prizes using (prize_id)
+where
+  participants.raffle_id = :raffle_id
+union all
+select
+  archived_participants.ticket_number,
+  archived_participants.ip_address,
+  prizes.name as prize
+from
+  archived_participants
+  left join prizes using (prize_id)
+where
+  archived_participants.raffle_id = :raffle_id
+order by
+  ticket_number;
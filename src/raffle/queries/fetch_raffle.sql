@@ -5,6 +5,8 @@ select
   total_tickets,
   available_tickets,
   winners_drawn,
+  opens_at,
+  waiting_room,
   prizes
 from
   raffles,
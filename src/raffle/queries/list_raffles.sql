@@ -5,6 +5,9 @@ select
   total_tickets,
   available_tickets,
   winners_drawn,
+  opens_at,
+  waiting_room,
+  created_at,
   prizes
 from
   raffles,
@@ -0,0 +1,36 @@
+-- name: list_participant_tickets
+-- Every ticket claimed from an ip address, keyed by raffle as an ip address
+-- can only claim one ticket per raffle.
+select
+  raffle_id,
+  raffles.name,
+  ticket_number,
+  claimed_at,
+  raffles.winners_drawn,
+  prizes.name as prize
+from
+  participants
+  join raffles using (raffle_id)
+  left join winners using (raffle_id, ticket_number)
+  left join prizes using (raffle_id, prize_id)
+where
+  participants.ip_address = :ip_address
+  and participants.raffle_id > :after_raffle
+union all
+select
+  raffle_id,
+  raffles.name,
+  ticket_number,
+  claimed_at,
+  raffles.winners_drawn,
+  prizes.name as prize
+from
+  archived_participants
+  join raffles using (raffle_id)
+  left join prizes using (raffle_id, prize_id)
+where
+  archived_participants.ip_address = :ip_address
+  and archived_participants.raffle_id > :after_raffle
+order by
+  raffle_id
+limit :limit;
@@ -6,6 +6,39 @@ from
   winners
   join prizes using (raffle_id, prize_id)
 where
-  raffle_id = :raffle_id
+  winners.raffle_id = :raffle_id
+  and winners.ticket_number > :after_ticket
+union all
+select
+  ticket_number,
+  prizes.name as prize
+from
+  archived_participants
+  join prizes using (raffle_id, prize_id)
+where
+  archived_participants.raffle_id = :raffle_id
+  and archived_participants.ticket_number > :after_ticket
 order by
-  ticket_number;
+  ticket_number
+limit :limit;
+
+-- name: fetch_winner^
+select
+  ticket_number,
+  prizes.name as prize
+from
+  winners
+  join prizes using (raffle_id, prize_id)
+where
+  winners.raffle_id = :raffle_id
+  and winners.ticket_number = :ticket_number
+union all
+select
+  ticket_number,
+  prizes.name as prize
+from
+  archived_participants
+  join prizes using (raffle_id, prize_id)
+where
+  archived_participants.raffle_id = :raffle_id
+  and archived_participants.ticket_number = :ticket_number;
@@ -14,10 +14,16 @@ select
   ticket_number
 from
   tickets
-  left join participants using (raffle_id, ticket_number)
 where
   raffle_id = :raffle_id
-  and ip_address is null
+  and not exists (
+    select
+      true
+    from
+      participants
+    where
+      participants.raffle_id = :raffle_id
+      and participants.ticket_number = tickets.ticket_number)
 order by
   ticket_order
 limit :limit;
@@ -30,6 +36,9 @@ insert into participants (raffle_id, ticket_number, ip_address, verification_cod
 update
   raffles
 set
-  available_tickets = available_tickets - 1
+  available_tickets = available_tickets - 1,
+  sold_out_at = case when available_tickets = 1 then
+    now()
+  end
 where
   raffle_id = :raffle_id;
@@ -0,0 +1,28 @@
+-- name: list_opening_raffles
+-- Raffles that open within the given number of seconds.
+select
+  raffle_id
+from
+  raffles
+where
+  opens_at > now()
+  and opens_at <= now() + make_interval(secs => :lead);
+
+-- name: prewarm_tickets$
+-- Read every ticket of a raffle, and the primary key entries that claims look
+-- its tickets up by, so that both are in shared buffers. The second scan only
+-- needs columns of the primary key, so it is answered from the index alone.
+select
+  (
+    select
+      sum(ticket_order)
+    from
+      tickets
+    where
+      raffle_id = :raffle_id) + (
+    select
+      count(ticket_number)
+    from
+      tickets
+    where
+      raffle_id = :raffle_id);
@@ -0,0 +1,31 @@
+-- name: record_claim!
+insert into claim_rollups (raffle_id, bucket, claims)
+  values (:raffle_id, date_trunc('minute', now()), 1)
+on conflict (raffle_id, bucket)
+  do update set
+    claims = claim_rollups.claims + 1;
+
+-- name: fetch_raffle_analytics^
+select
+  raffle_id,
+  created_at,
+  -- Raffles opening after they were created only sell from their opening
+  greatest(created_at, opens_at::timestamp) as opened_at,
+  sold_out_at,
+  total_tickets,
+  available_tickets
+from
+  raffles
+where
+  raffle_id = :raffle_id;
+
+-- name: list_claim_rollups
+select
+  bucket,
+  claims
+from
+  claim_rollups
+where
+  raffle_id = :raffle_id
+order by
+  bucket;
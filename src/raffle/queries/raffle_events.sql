@@ -0,0 +1,9 @@
+-- name: list_raffle_updates
+select
+  raffle_id,
+  available_tickets,
+  winners_drawn
+from
+  raffles
+where
+  raffle_id = any (:raffle_ids);
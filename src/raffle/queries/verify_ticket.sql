@@ -5,6 +5,16 @@ select
   verification_code = crypt(:verification_code, verification_code) as is_valid
 from
   participants
+where
+  raffle_id = :raffle_id
+  and ticket_number = :ticket_number
+union all
+select
+  raffle_id,
+  ticket_number,
+  verification_code = crypt(:verification_code, verification_code) as is_valid
+from
+  archived_participants
 where
   raffle_id = :raffle_id
   and ticket_number = :ticket_number;
@@ -14,8 +24,18 @@ select
   prizes.name as prize
 from
   participants
-  left join winners using (raffle_id, ticket_number)
+  left join winners on winners.raffle_id = :raffle_id
+    and winners.ticket_number = participants.ticket_number
   left join prizes using (prize_id)
 where
   participants.raffle_id = :raffle_id
-  and ticket_number = :ticket_number;
+  and participants.ticket_number = :ticket_number
+union all
+select
+  prizes.name as prize
+from
+  archived_participants
+  left join prizes using (prize_id)
+where
+  archived_participants.raffle_id = :raffle_id
+  and archived_participants.ticket_number = :ticket_number;
@@ -0,0 +1,42 @@
+-- name: join_queue!
+-- Take a place in the waiting room of a raffle, unless already holding one.
+insert into queue_entries (raffle_id, ip_address)
+  values (:raffle_id, :ip_address)
+on conflict (raffle_id, ip_address)
+  do nothing;
+
+-- name: fetch_queue_entry^
+-- The position of an entry is how far its number is past the first number
+-- taken in its raffle, which is a single lookup in the index on (raffle_id,
+-- entry_id). Numbers taken by other raffles in between leave gaps, which only
+-- make positions look further back than they are. Positions are admitted
+-- once they are within a window of the claimed tickets, which is at least the
+-- number of claims in the last minute or so. Admission also moves on by at
+-- least one window for every minute the raffle has been open, so that places
+-- admitted but never used cannot hold up the rest of the queue.
+select
+  queue_entries.entry_id - (
+    select
+      min(entry_id)
+    from
+      queue_entries
+    where
+      raffle_id = :raffle_id) + 1 as position,
+  greatest(raffles.total_tickets - raffles.available_tickets, :window * opened.minutes) + greatest(:window, recent.claims) as admitted_position
+from
+  queue_entries
+  join raffles using (raffle_id),
+  lateral (
+    select
+      coalesce(sum(claims), 0) as claims
+    from
+      claim_rollups
+    where
+      claim_rollups.raffle_id = :raffle_id
+      and bucket >= date_trunc('minute', now()) - interval '1 minute') as recent,
+  lateral (
+    select
+      greatest(0, floor(extract(epoch from now()::timestamp - greatest(raffles.created_at, raffles.opens_at::timestamp)) / 60))::integer as minutes) as opened
+where
+  queue_entries.raffle_id = :raffle_id
+  and queue_entries.ip_address = :ip_address;
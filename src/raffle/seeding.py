@@ -0,0 +1,292 @@
+"""Generate large synthetic datasets directly in the database for capacity tests.
+
+Rows are streamed to the server with `copy` rather than created through the
+API, and every random choice comes from a generator seeded per raffle, so the
+same options always produce the same raffles. Verification codes are hashed
+once and shared by every participant, as crypt is far slower than the load.
+
+Ticket counts follow a log-uniform distribution, so most raffles are small and
+a few are very large, and each raffle is either drawn, sold out or partly
+claimed in the configured proportions.
+"""
+import contextlib
+import dataclasses
+import datetime
+import functools
+import ipaddress
+import math
+import random
+import uuid
+from typing import Iterator, Sequence
+
+import psycopg
+
+from .db import shard_index
+
+COPY_STATEMENTS = {
+    "raffles": (
+        "copy raffles (raffle_id, created_at, name, total_tickets,"
+        " available_tickets, sold_out_at, winners_drawn, drawn_at) from stdin"
+    ),
+    "prizes": "copy prizes (prize_id, raffle_id, name, amount) from stdin",
+    "tickets": "copy tickets (raffle_id, ticket_number, ticket_order) from stdin",
+    "participants": (
+        "copy participants (raffle_id, ticket_number, ip_address,"
+        " verification_code, claimed_at) from stdin"
+    ),
+    "winners": "copy winners (raffle_id, ticket_number, prize_id) from stdin",
+}
+
+# Participants are given addresses from this private network
+PLAYER_NETWORK = ipaddress.IPv4Network("10.0.0.0/8")
+
+# Code hashed once for every seeded participant
+VERIFICATION_CODE = "SEEDCODE"
+
+
+@dataclasses.dataclass(frozen=True)
+class RafflePlan:
+    """The shape of a seeded raffle, from which all of its rows are derived."""
+
+    seed: str
+    name: str
+    raffle_id: uuid.UUID
+    created_at: datetime.datetime
+    claim_window: datetime.timedelta
+    total_tickets: int
+    claimed: int
+    drawn: bool
+    prizes: tuple[int, ...]
+    first_prize_id: int = 1
+
+
+def plan_raffles(
+    raffles: int,
+    *,
+    min_tickets: int,
+    max_tickets: int,
+    max_prizes: int,
+    sold_out_ratio: float,
+    drawn_ratio: float,
+    days: int,
+    seed: int,
+    now: datetime.datetime,
+) -> list[RafflePlan]:
+    rng = random.Random(seed)
+    plans = []
+
+    for index in range(raffles):
+        total_tickets = round(
+            math.exp(rng.uniform(math.log(min_tickets), math.log(max_tickets)))
+        )
+        state = rng.random()
+        drawn = state < drawn_ratio
+        sold_out = state < drawn_ratio + sold_out_ratio
+        kinds = rng.randint(1, min(max_prizes, total_tickets))
+        age = datetime.timedelta(seconds=rng.uniform(0, days * 86400))
+
+        plans.append(
+            RafflePlan(
+                seed=f"{seed}:{index}",
+                name=f"Raffle {index + 1}",
+                raffle_id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                created_at=now - age,
+                claim_window=datetime.timedelta(seconds=rng.uniform(60, 3600)),
+                total_tickets=total_tickets,
+                claimed=total_tickets if sold_out else rng.randrange(total_tickets),
+                drawn=drawn,
+                # At most a tenth of the tickets win so every prize can be drawn
+                prizes=tuple(
+                    rng.randint(1, max(1, total_tickets // (10 * kinds)))
+                    for _ in range(kinds)
+                ),
+            )
+        )
+
+    return plans
+
+
+def claimed_tickets(
+    plan: RafflePlan, players: int
+) -> list[tuple[int, int, datetime.datetime]]:
+    """Return the ticket number, player and claim time of each participant."""
+    rng = random.Random(f"{plan.seed}:participants")
+    ticket_numbers = rng.sample(range(1, plan.total_tickets + 1), plan.claimed)
+    player_numbers = rng.sample(range(players), plan.claimed)
+
+    return [
+        (ticket_number, player, plan.created_at + plan.claim_window * rng.random())
+        for ticket_number, player in zip(ticket_numbers, player_numbers)
+    ]
+
+
+def raffle_rows(plan: RafflePlan) -> Iterator[tuple]:
+    sold_out_at = (
+        plan.created_at + plan.claim_window
+        if plan.claimed == plan.total_tickets
+        else None
+    )
+    # Drawn raffles were drawn once their claim window closed
+    drawn_at = plan.created_at + plan.claim_window if plan.drawn else None
+    yield (
+        plan.raffle_id,
+        plan.created_at,
+        plan.name,
+        plan.total_tickets,
+        plan.total_tickets - plan.claimed,
+        sold_out_at,
+        plan.drawn,
+        drawn_at,
+    )
+
+
+def prize_rows(plan: RafflePlan) -> Iterator[tuple]:
+    for number, amount in enumerate(plan.prizes):
+        prize_id = plan.first_prize_id + number
+        yield prize_id, plan.raffle_id, f"Prize {number + 1}", amount
+
+
+def ticket_rows(plan: RafflePlan) -> Iterator[tuple]:
+    rng = random.Random(f"{plan.seed}:tickets")
+
+    for ticket_number in range(1, plan.total_tickets + 1):
+        yield plan.raffle_id, ticket_number, rng.random()
+
+
+def participant_rows(
+    plan: RafflePlan, players: int, verification_code: str
+) -> Iterator[tuple]:
+    for ticket_number, player, claimed_at in claimed_tickets(plan, players):
+        yield (
+            plan.raffle_id,
+            ticket_number,
+            PLAYER_NETWORK[player],
+            verification_code,
+            claimed_at,
+        )
+
+
+def winner_rows(plan: RafflePlan, players: int) -> Iterator[tuple]:
+    if not plan.drawn:
+        return
+
+    rng = random.Random(f"{plan.seed}:winners")
+    ticket_numbers = [ticket[0] for ticket in claimed_tickets(plan, players)]
+    winners = iter(rng.sample(ticket_numbers, sum(plan.prizes)))
+
+    for prize_id, amount in enumerate(plan.prizes, start=plan.first_prize_id):
+        for _ in range(amount):
+            yield plan.raffle_id, next(winners), prize_id
+
+
+def seed_raffles(
+    conns: Sequence[psycopg.Connection],
+    *,
+    raffles: int,
+    min_tickets: int = 10,
+    max_tickets: int = 10_000,
+    max_prizes: int = 5,
+    sold_out_ratio: float = 0.3,
+    drawn_ratio: float = 0.3,
+    players: int = 100_000,
+    days: int = 30,
+    seed: int = 0,
+    crypt_algorithm: str = "md5",
+) -> int:
+    """Load synthetic raffles into the shard databases and return how many.
+
+    Each connection is a shard, and every raffle is loaded into the shard of its
+    id. All shards are loaded in a single transaction each.
+    """
+    if not 0 < min_tickets <= max_tickets <= players <= PLAYER_NETWORK.num_addresses:
+        raise ValueError(
+            "Ticket and player counts must satisfy 0 < min <= max <= players"
+        )
+
+    if sold_out_ratio + drawn_ratio > 1:
+        raise ValueError("Sold out and drawn ratios must not exceed 1 together")
+
+    plans = plan_raffles(
+        raffles,
+        min_tickets=min_tickets,
+        max_tickets=max_tickets,
+        max_prizes=max_prizes,
+        sold_out_ratio=sold_out_ratio,
+        drawn_ratio=drawn_ratio,
+        days=days,
+        seed=seed,
+        now=datetime.datetime.now(),
+    )
+    shards = [shard_index(plan.raffle_id, len(conns)) for plan in plans]
+
+    with contextlib.ExitStack() as stack:
+        for conn in conns:
+            stack.enter_context(conn.transaction())
+
+        (verification_code,) = (
+            conns[0]
+            .execute(
+                "select crypt(%s, gen_salt(%s))", [VERIFICATION_CODE, crypt_algorithm]
+            )
+            .fetchone()
+        )
+
+        # Prize ids are given explicitly so that winners can refer to them
+        next_prize_ids = [
+            conn.execute(
+                "select coalesce(max(prize_id), 0) + 1 from prizes"
+            ).fetchone()[0]
+            for conn in conns
+        ]
+
+        for number, (shard, plan) in enumerate(zip(shards, plans)):
+            plans[number] = dataclasses.replace(
+                plan, first_prize_id=next_prize_ids[shard]
+            )
+            next_prize_ids[shard] += len(plan.prizes)
+
+        tables = {
+            "raffles": raffle_rows,
+            "prizes": prize_rows,
+            "tickets": ticket_rows,
+            "participants": functools.partial(
+                participant_rows, players=players, verification_code=verification_code
+            ),
+            "winners": functools.partial(winner_rows, players=players),
+        }
+
+        # Tables are loaded in order so that every foreign key can be checked
+        for table, rows in tables.items():
+            with contextlib.ExitStack() as copies:
+                shard_copies = [
+                    copies.enter_context(conn.cursor().copy(COPY_STATEMENTS[table]))
+                    for conn in conns
+                ]
+
+                for shard, plan in zip(shards, plans):
+                    for row in rows(plan):
+                        shard_copies[shard].write_row(row)
+
+        for shard, conn in enumerate(conns):
+            raffle_ids = [
+                plan.raffle_id for plan, index in zip(plans, shards) if index == shard
+            ]
+            conn.execute(
+                "select setval(pg_get_serial_sequence('prizes', 'prize_id'),"
+                " (select max(prize_id) from prizes))"
+            )
+            conn.execute(
+                """
+                insert into claim_rollups (raffle_id, bucket, claims)
+                select raffle_id, date_trunc('minute', claimed_at), count(*)
+                from participants
+                where raffle_id = any(%s)
+                group by 1, 2
+                """,
+                [raffle_ids],
+            )
+
+    for conn in conns:
+        conn.execute("analyze")
+
+    return len(plans)
@@ -0,0 +1,49 @@
+"""Warm up the database and connections shortly before a raffle opens.
+
+The first second of a sale is its busiest, so raffles with an opening time are
+prepared ahead of it. The pages of the raffle's tickets and of the index that
+claims look them up by are read into shared buffers, so that the opening spike
+does not start against cold caches. Pools are opened with every connection
+they may hold, so they are kept full by replacing any that have broken.
+"""
+import asyncio
+import logging
+import uuid
+
+import psycopg
+from psycopg_pool import ConnectionPool
+from starlette.concurrency import run_in_threadpool
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+
+def warm_opening_raffles(pool: ConnectionPool, lead: float) -> list[uuid.UUID]:
+    """Warm every raffle that opens within `lead` seconds and return their ids."""
+    with db.connection(pool, None) as conn:
+        raffle_ids = [
+            row.raffle_id for row in db.queries.list_opening_raffles(conn, lead=lead)
+        ]
+
+        for raffle_id in raffle_ids:
+            db.queries.prewarm_tickets(conn, raffle_id=raffle_id)
+
+    if raffle_ids:
+        pool.check()
+
+    return raffle_ids
+
+
+async def warm_periodically(pool: ConnectionPool, lead: float):
+    """Warm raffles about to open, looking twice per `lead` seconds."""
+    while True:
+        try:
+            raffle_ids = await run_in_threadpool(warm_opening_raffles, pool, lead)
+        except psycopg.Error:
+            logger.exception("Failed to warm opening raffles")
+        else:
+            if raffle_ids:
+                logger.info("Warmed %d raffles about to open", len(raffle_ids))
+
+        await asyncio.sleep(lead / 2)
@@ -12,6 +12,16 @@ from raffle.config import Settings, load_settings
 pytest_plugins = ["factories"]
 
 
+def pytest_collection_modifyitems(config, items):
+    """Skip tests marked as needing Postgres when testing the memory backend."""
+    if load_settings().db_backend != "memory":
+        return
+
+    for item in items:
+        if "postgres" in item.keywords:
+            item.add_marker(pytest.mark.skip(reason="Needs a Postgres database"))
+
+
 @pytest.fixture(scope="session")
 def manager_ip() -> str:
     """Specify a unique ip address for test requests from a manager."""
@@ -37,6 +47,9 @@ def test_settings(manager_ip) -> Settings:
 @pytest.fixture(scope="session")
 def test_db(settings, test_settings):
     """Create a test database if one does not already exist."""
+    if settings.db_backend == "memory":
+        return
+
     with db.create_connection(settings) as conn:
         try:
             conn.execute(f"create database {test_settings.db_database};")
@@ -11,6 +11,8 @@ def raffle_factory(client, manager_ip, override_ip):
         *,
         name: str = "raffle",
         total_tickets: int = 1,
+        opens_at: str | None = None,
+        waiting_room: bool = False,
         prizes: Iterable[dict] = ({"name": "prize", "amount": 1},),
     ) -> dict:
         with override_ip(manager_ip):
@@ -19,6 +21,8 @@ def raffle_factory(client, manager_ip, override_ip):
                 json={
                     "name": name,
                     "total_tickets": total_tickets,
+                    "opens_at": opens_at,
+                    "waiting_room": waiting_room,
                     "prizes": list(prizes),
                 },
             )
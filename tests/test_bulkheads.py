@@ -0,0 +1,66 @@
+import pytest
+
+from raffle import deps
+
+
+@pytest.fixture()
+def bulkhead_settings(client, test_settings):
+    """Give verification and managers one connection and little time to wait."""
+    settings = test_settings.model_copy(
+        update={
+            "db_pool_size_manager": 1,
+            "db_pool_size_verification": 1,
+            "endpoint_timeouts": {"export_raffle": 0.1, "verify_ticket": 0.1},
+        }
+    )
+    client.app.dependency_overrides[deps.get_settings] = lambda: settings
+    return settings
+
+
+@pytest.mark.postgres
+def test_bulkheads_have_separate_pools(bulkhead_settings):
+    claims = deps.get_bulkhead_pools(bulkhead_settings, "claims")
+    verification = deps.get_bulkhead_pools(bulkhead_settings, "verification")
+
+    assert claims[0] is not verification[0]
+    assert claims[0].max_size == bulkhead_settings.db_pool_size_claims
+    assert verification[0].max_size == 1
+
+
+@pytest.mark.postgres
+def test_manager_endpoints_do_not_share_public_pool(
+    client, raffle_factory, override_ip, manager_ip, bulkhead_settings
+):
+    raffle = raffle_factory()
+    (manager,) = deps.get_bulkhead_pools(bulkhead_settings, "manager")
+
+    with manager.connection():
+        with override_ip(manager_ip):
+            response = client.get(f"/raffles/{raffle['raffle_id']}/export/")
+
+        assert response.status_code == 503
+
+        response = client.get(f"/raffles/{raffle['raffle_id']}/")
+
+        assert response.status_code == 200
+
+
+@pytest.mark.postgres
+def test_saturated_bulkhead_does_not_block_others(
+    client, raffle_factory, bulkhead_settings
+):
+    raffle = raffle_factory()
+    (verification,) = deps.get_bulkhead_pools(bulkhead_settings, "verification")
+
+    with verification.connection():
+        response = client.post(
+            f"/raffles/{raffle['raffle_id']}/verify-ticket/",
+            json={"ticket_number": 1, "verification_code": "ABCDEFGH"},
+        )
+
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Request timed out"
+
+        response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+        assert response.status_code == 200
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from raffle.cache import ReplayCache, SingleFlight, TTLCache
+
+
+def test_ttl_cache_evicts_oldest_entry():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries(mocker):
+    monotonic = mocker.patch("raffle.cache.time.monotonic", return_value=0)
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    cache.set("a", 1)
+    monotonic.return_value = 60
+
+    assert cache.get("a") is None
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(True)
+        started.set()
+        release.wait()
+        return "result"
+
+    leader = threading.Thread(
+        target=lambda: results.append(single_flight.do("a", slow))
+    )
+    leader.start()
+    started.wait()
+
+    follower = threading.Thread(
+        target=lambda: results.append(single_flight.do("a", slow))
+    )
+    follower.start()
+    follower.join(timeout=0.1)
+
+    assert follower.is_alive()
+
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert calls == [True]
+    assert results == ["result", "result"]
+    assert (single_flight.calls, single_flight.shared) == (1, 1)
+
+
+def test_single_flight_waiting_caller_times_out():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait()
+        return "result"
+
+    leader = threading.Thread(
+        target=lambda: results.append(single_flight.do("a", slow))
+    )
+    leader.start()
+    started.wait()
+
+    with pytest.raises(TimeoutError):
+        single_flight.do("a", slow, timeout=0.01)
+
+    release.set()
+    leader.join()
+
+    assert results == ["result"]
+
+
+def test_replay_cache_does_not_remember_errors():
+    cache = ReplayCache(maxsize=1, ttl=60)
+
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        cache.run("a", fail)
+
+    assert cache.run("a", lambda: "result") == "result"
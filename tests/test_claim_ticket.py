@@ -1,5 +1,8 @@
+import datetime
 import uuid
 
+from raffle import db
+
 
 def test_claim_ticket_success_response(client, override_ip, raffle):
     with override_ip("127.0.0.1"):
@@ -18,7 +21,10 @@ def test_claim_ticket_does_not_exist(client, override_ip):
     assert response.json()["detail"] == "Raffle not found"
 
 
-def test_claim_ticket_cannot_participate_twice(client, override_ip, raffle):
+def test_claim_ticket_cannot_participate_twice(client, override_ip, raffle_factory):
+    # A second ticket keeps the raffle from selling out after the first claim
+    raffle = raffle_factory(total_tickets=2)
+
     with override_ip("127.0.0.1"):
         response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
 
@@ -31,6 +37,24 @@ def test_claim_ticket_cannot_participate_twice(client, override_ip, raffle):
     assert response.json()["detail"] == "Already participated"
 
 
+def test_claim_ticket_racing_same_ip_address(
+    client, override_ip, raffle_factory, mocker
+):
+    raffle = raffle_factory(total_tickets=3)
+
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+        # The second request checks before the first has claimed its ticket
+        mocker.patch.object(
+            db.queries, "has_ip_address_participated", return_value=False
+        )
+        response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Already participated"
+
+
 def test_claim_ticket_no_more_tickets(client, override_ip, raffle):
     with override_ip("127.0.0.1"):
         response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
@@ -42,3 +66,96 @@ def test_claim_ticket_no_more_tickets(client, override_ip, raffle):
 
     assert response.status_code == 410
     assert response.json()["detail"] == "No tickets remaining"
+
+
+def test_claim_ticket_idempotency_key_replays_response(client, override_ip, raffle):
+    headers = {"Idempotency-Key": "key"}
+
+    with override_ip("127.0.0.1"):
+        first = client.post(
+            f"/raffles/{raffle['raffle_id']}/participate/", headers=headers
+        )
+        second = client.post(
+            f"/raffles/{raffle['raffle_id']}/participate/", headers=headers
+        )
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+
+
+def test_claim_ticket_idempotency_key_is_per_ip_address(client, override_ip, raffle):
+    headers = {"Idempotency-Key": "key"}
+
+    with override_ip("127.0.0.1"):
+        response = client.post(
+            f"/raffles/{raffle['raffle_id']}/participate/", headers=headers
+        )
+
+    assert response.status_code == 200
+
+    with override_ip("127.0.0.2"):
+        response = client.post(
+            f"/raffles/{raffle['raffle_id']}/participate/", headers=headers
+        )
+
+    assert response.status_code == 410
+
+
+def test_claim_ticket_sold_out_skips_database(client, override_ip, raffle, mocker):
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip("127.0.0.2"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    fetch_raffle = mocker.spy(db.queries, "fetch_raffle")
+
+    with override_ip("127.0.0.3"):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    assert response.status_code == 410
+    assert response.json()["detail"] == "No tickets remaining"
+    assert fetch_raffle.call_count == 0
+
+
+def test_claim_ticket_not_found_skips_database(client, override_ip, mocker):
+    raffle_id = uuid.uuid4()
+
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle_id}/participate/")
+
+    fetch_raffle = mocker.spy(db.queries, "fetch_raffle")
+
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{raffle_id}/participate/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Raffle not found"
+    assert fetch_raffle.call_count == 0
+
+
+def test_claim_ticket_before_opening(client, raffle_factory, override_ip):
+    opens_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        minutes=10
+    )
+    raffle = raffle_factory(opens_at=opens_at.isoformat())
+
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    assert response.status_code == 425
+    assert response.json()["detail"] == "Raffle not open yet"
+    assert 0 < int(response.headers["retry-after"]) <= 600
+
+
+def test_claim_ticket_after_opening(client, raffle_factory, override_ip):
+    opens_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        minutes=10
+    )
+    raffle = raffle_factory(opens_at=opens_at.isoformat())
+
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    assert response.status_code == 200
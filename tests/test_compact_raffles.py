@@ -0,0 +1,75 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from raffle import compaction, db, deps
+
+
+@pytest.fixture()
+def drawn_raffle(client, raffle, override_ip, manager_ip) -> dict:
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffle['raffle_id']}/winners/")
+
+    return {**raffle, "ticket": response.json()}
+
+
+def test_compact_raffles_skips_undrawn_raffles(test_db_conn, raffle):
+    assert compaction.compact_raffles(test_db_conn) == 0
+
+
+def test_compact_raffles_skips_recently_drawn_raffles(test_db_conn, drawn_raffle):
+    assert compaction.compact_raffles(test_db_conn, min_age=3600) == 0
+    assert compaction.compact_raffles(test_db_conn) == 1
+
+
+@pytest.mark.postgres
+def test_compact_raffles_drops_tickets(test_db_conn, drawn_raffle):
+    assert compaction.compact_raffles(test_db_conn) == 1
+    assert compaction.compact_raffles(test_db_conn) == 0
+
+    tickets = test_db_conn.execute("select count(*) from tickets").fetchone()[0]
+
+    assert tickets == 0
+
+
+def test_compact_raffles_keeps_winners(client, test_db_conn, drawn_raffle):
+    compaction.compact_raffles(test_db_conn)
+
+    response = client.get(f"/raffles/{drawn_raffle['raffle_id']}/winners/")
+
+    assert response.status_code == 200
+    assert response.json() == [{"ticket_number": 1, "prize": "prize"}]
+
+
+def test_compact_raffles_keeps_verification(client, test_db_conn, drawn_raffle):
+    compaction.compact_raffles(test_db_conn)
+
+    response = client.post(
+        f"/raffles/{drawn_raffle['raffle_id']}/verify-ticket/",
+        json=drawn_raffle["ticket"],
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"has_won": True, "prize": "prize"}
+
+
+def test_app_compacts_raffles_in_the_background(
+    test_app, test_db_conn, test_settings, drawn_raffle
+):
+    settings = test_settings.model_copy(
+        update={"compact_interval": 1, "compact_min_age": 0}
+    )
+    test_app.dependency_overrides[deps.get_settings] = lambda: settings
+
+    with TestClient(test_app):
+        for _ in range(50):
+            if db.queries.lock_compactable_raffle(test_db_conn, min_age=0) is None:
+                break
+
+            time.sleep(0.1)
+
+    assert compaction.compact_raffles(test_db_conn) == 0
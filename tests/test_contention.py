@@ -0,0 +1,38 @@
+import uuid
+
+from raffle.contention import ContentionTracker
+
+
+def test_contention_tracker_starts_at_minimum_pool():
+    tracker = ContentionTracker(min_pool=10, max_pool=100, maxsize=10)
+
+    assert tracker.pool_size(uuid.uuid4()) == 10
+
+
+def test_contention_tracker_grows_pool_on_collision():
+    tracker = ContentionTracker(min_pool=10, max_pool=100, maxsize=10)
+    raffle_id = uuid.uuid4()
+
+    tracker.record(raffle_id, collided=True)
+
+    assert tracker.pool_size(raffle_id) == 20
+
+    for _ in range(5):
+        tracker.record(raffle_id, collided=True)
+
+    assert tracker.pool_size(raffle_id) == 100
+
+
+def test_contention_tracker_shrinks_pool_once_collisions_stop():
+    tracker = ContentionTracker(min_pool=10, max_pool=100, maxsize=10)
+    raffle_id = uuid.uuid4()
+
+    tracker.record(raffle_id, collided=True)
+    tracker.record(raffle_id, collided=False)
+
+    assert tracker.pool_size(raffle_id) == 20
+
+    for _ in range(100):
+        tracker.record(raffle_id, collided=False)
+
+    assert tracker.pool_size(raffle_id) == 10
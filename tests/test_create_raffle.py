@@ -1,3 +1,5 @@
+import datetime
+
 import pytest
 
 
@@ -22,6 +24,18 @@ def test_create_raffle_success_response(client, manager_ip, override_ip):
     assert payload["total_tickets"] == 5
     assert payload["available_tickets"] == 5
     assert payload["winners_drawn"] is False
+    assert payload["opens_at"] is None
+
+
+def test_create_raffle_opens_at(client, raffle_factory):
+    raffle = raffle_factory(opens_at="2030-08-01T12:00:00+00:00")
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/")
+
+    # The database may return the time in another zone, so compare instants
+    assert datetime.datetime.fromisoformat(
+        response.json()["opens_at"]
+    ) == datetime.datetime.fromisoformat(raffle["opens_at"])
 
 
 def test_create_raffle_unauthorized(client, override_ip):
@@ -79,6 +93,12 @@ def test_create_raffle_unauthorized(client, override_ip):
             "total_tickets": 5,
             "prizes": [{"name": "prize", "amount": 1}],
         },
+        {
+            "name": "test",
+            "total_tickets": 5,
+            "opens_at": "2023-08-01T12:00:00",
+            "prizes": [{"name": "prize", "amount": 1}],
+        },
     ],
 )
 def test_create_raffle_validation_error(client, json, manager_ip, override_ip):
@@ -1,31 +1,41 @@
+import contextlib
+import uuid
+
 import psycopg.errors
+import psycopg_pool
 import pytest
 
 from raffle import db
+from raffle.deadlines import Deadline
 
 
 def test_two_participants_cannot_claim_same_ticket(test_db_conn):
-    raffle = db.queries.create_raffle(
+    raffle_id = uuid.uuid4()
+
+    db.queries.create_raffle(
         test_db_conn,
+        raffle_id=raffle_id,
         name="raffle",
         total_tickets=1,
+        opens_at=None,
+        waiting_room=False,
     )
 
     db.queries.create_tickets(
         test_db_conn,
-        raffle_id=raffle.raffle_id,
+        raffle_id=raffle_id,
         total_tickets=1,
     )
 
     ticket, *_ = db.queries.fetch_ticket_pool(
         test_db_conn,
-        raffle_id=raffle.raffle_id,
+        raffle_id=raffle_id,
         limit=1,
     )
 
     db.queries.claim_ticket(
         test_db_conn,
-        raffle_id=raffle.raffle_id,
+        raffle_id=raffle_id,
         ticket_number=ticket.ticket_number,
         ip_address="127.0.0.1",
         verification_code="asdf",
@@ -35,9 +45,112 @@ def test_two_participants_cannot_claim_same_ticket(test_db_conn):
     with pytest.raises(psycopg.errors.UniqueViolation):
         db.queries.claim_ticket(
             test_db_conn,
-            raffle_id=raffle.raffle_id,
+            raffle_id=raffle_id,
             ticket_number=ticket.ticket_number,
             ip_address="127.0.0.2",
             verification_code="asdf",
             crypt_algorithm="md5",
         )
+
+
+def test_pipeline_rolls_back_when_block_fails(test_db_conn):
+    raffle_id = uuid.uuid4()
+
+    with db.pipeline(test_db_conn):
+        db.queries.create_raffle(
+            test_db_conn,
+            raffle_id=raffle_id,
+            name="raffle",
+            total_tickets=1,
+            opens_at=None,
+            waiting_room=False,
+        )
+        db.queries.create_tickets(test_db_conn, raffle_id=raffle_id, total_tickets=1)
+
+    for ip_address in ["127.0.0.1", "127.0.0.2"]:
+        with contextlib.suppress(psycopg.errors.UniqueViolation):
+            with db.pipeline(test_db_conn):
+                db.queries.claim_ticket(
+                    test_db_conn,
+                    raffle_id=raffle_id,
+                    ticket_number=1,
+                    ip_address=ip_address,
+                    verification_code="asdf",
+                    crypt_algorithm="md5",
+                )
+                db.queries.release_ticket(test_db_conn, raffle_id=raffle_id)
+
+    raffle = db.queries.fetch_raffle(test_db_conn, raffle_id=raffle_id)
+
+    assert raffle.available_tickets == 0
+
+
+def _relation_names(plan: dict) -> set[str]:
+    names = {plan["Relation Name"]} if "Relation Name" in plan else set()
+
+    for subplan in plan.get("Plans", []):
+        names |= _relation_names(subplan)
+
+    return names
+
+
+@pytest.mark.postgres
+def test_partitioned_queries_prune_to_single_partition(test_db_conn, test_settings):
+    db.migrations.delete_schema(test_db_conn)
+    db.configure_partitions(
+        test_db_conn, test_settings.model_copy(update={"db_partitions": 4})
+    )
+    db.migrations.create_schema(test_db_conn)
+
+    raffle_id = uuid.uuid4()
+
+    db.queries.create_raffle(
+        test_db_conn,
+        raffle_id=raffle_id,
+        name="raffle",
+        total_tickets=1,
+        opens_at=None,
+        waiting_room=False,
+    )
+
+    cursor = psycopg.ClientCursor(test_db_conn)
+    cursor.execute(
+        f"explain (format json) {db.queries.fetch_ticket_pool.sql}",
+        {"raffle_id": raffle_id, "limit": 1},
+    )
+    (plan,) = cursor.fetchone()[0]
+
+    relation_names = _relation_names(plan["Plan"])
+
+    assert sorted(name.rsplit("_", 1)[0] for name in relation_names) == [
+        "participants",
+        "tickets",
+    ]
+
+
+@pytest.mark.postgres
+def test_connection_cancels_slow_statements(test_settings):
+    with psycopg_pool.ConnectionPool(test_settings.db_urls[0], min_size=1) as pool:
+        with db.connection(pool, Deadline(0.05)) as conn:
+            with pytest.raises(psycopg.errors.QueryCanceled):
+                conn.execute("select pg_sleep(1)")
+
+
+@pytest.mark.postgres
+def test_connection_keeps_statement_timeout_between_checkouts(test_settings):
+    def statement_timeout(conn: psycopg.Connection) -> str:
+        return conn.execute("show statement_timeout").fetchone()[0]
+
+    with psycopg_pool.ConnectionPool(test_settings.db_urls[0], min_size=1) as pool:
+        with db.connection(pool, Deadline(5)) as conn:
+            first = statement_timeout(conn)
+
+        # A timeout a little shorter than needed is kept, a longer one is not
+        with db.connection(pool, Deadline(5)) as conn:
+            assert statement_timeout(conn) == first
+
+        with db.connection(pool, Deadline(1)) as conn:
+            assert statement_timeout(conn) != first
+
+        with db.connection(pool, Deadline(5), limit_statements=False) as conn:
+            assert statement_timeout(conn) == "0"
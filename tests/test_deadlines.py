@@ -0,0 +1,52 @@
+import pytest
+
+from raffle import deps
+from raffle.deadlines import Deadline, DeadlineExceeded
+
+
+def test_deadline_remaining(mocker):
+    monotonic = mocker.patch("raffle.deadlines.time.monotonic", return_value=0)
+    deadline = Deadline(2.0)
+
+    monotonic.return_value = 1.5
+    assert deadline.remaining() == 0.5
+
+    monotonic.return_value = 3
+    assert deadline.remaining() == 0.0
+
+    with pytest.raises(DeadlineExceeded, match="Request deadline exceeded"):
+        deadline.check()
+
+
+@pytest.fixture()
+def endpoint_timeouts(client, test_settings):
+    """Return a function to override the time budget of endpoints."""
+
+    def inner(**timeouts):
+        settings = test_settings.model_copy(update={"endpoint_timeouts": timeouts})
+        client.app.dependency_overrides[deps.get_settings] = lambda: settings
+
+    return inner
+
+
+def test_claim_ticket_deadline_exceeded(client, raffle, endpoint_timeouts):
+    endpoint_timeouts(claim_ticket=1e-9)
+
+    response = client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Request deadline exceeded"
+
+    endpoint_timeouts()
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/")
+
+    assert response.json()["available_tickets"] == 1
+
+
+def test_fetch_raffle_within_deadline(client, raffle, endpoint_timeouts):
+    endpoint_timeouts(fetch_raffle=5.0)
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/")
+
+    assert response.status_code == 200
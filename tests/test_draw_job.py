@@ -0,0 +1,128 @@
+import uuid
+
+import psycopg.errors
+import pytest
+
+from raffle import drawing, jobs
+
+
+@pytest.fixture()
+def sold_out_raffle(client, raffle, override_ip) -> dict:
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    return raffle
+
+
+def test_create_draw_job_success_response(
+    client, sold_out_raffle, override_ip, manager_ip
+):
+    with override_ip(manager_ip):
+        response = client.post(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+
+    assert response.status_code == 202
+    assert response.json() == {
+        "raffle_id": sold_out_raffle["raffle_id"],
+        "status": "pending",
+        "error": None,
+    }
+
+
+def test_create_draw_job_is_idempotent(
+    client, sold_out_raffle, override_ip, manager_ip
+):
+    with override_ip(manager_ip):
+        first = client.post(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+        second = client.post(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+
+    assert second.status_code == 202
+    assert second.json() == first.json()
+
+
+def test_create_draw_job_tickets_available(client, raffle, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/draw-job/")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Tickets remaining"
+
+
+def test_create_draw_job_unauthorized(client, raffle, override_ip):
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/draw-job/")
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Unauthorized"
+
+
+def test_create_draw_job_raffle_not_found(client, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        response = client.post(f"/raffles/{uuid.uuid4()}/draw-job/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Raffle not found"
+
+
+def test_fetch_draw_job_not_found(client, raffle, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{raffle['raffle_id']}/draw-job/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Draw job not found"
+
+
+def test_run_next_draw_job_draws_winners(
+    client, test_db_conn, sold_out_raffle, override_ip, manager_ip
+):
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+
+    assert jobs.run_next_draw_job(test_db_conn) is True
+    assert jobs.run_next_draw_job(test_db_conn) is False
+
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+
+    assert response.json()["status"] == "done"
+
+    response = client.get(f"/raffles/{sold_out_raffle['raffle_id']}/winners/")
+
+    assert response.json() == [{"ticket_number": 1, "prize": "prize"}]
+
+
+def test_run_next_draw_job_winners_already_drawn(
+    client, test_db_conn, sold_out_raffle, override_ip, manager_ip
+):
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+        client.post(f"/raffles/{sold_out_raffle['raffle_id']}/winners/")
+
+    jobs.run_next_draw_job(test_db_conn)
+
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+
+    assert response.json()["status"] == "failed"
+    assert response.json()["error"] == "Winners already drawn"
+
+
+def test_run_next_draw_job_database_error(
+    client, test_db_conn, sold_out_raffle, override_ip, manager_ip, mocker
+):
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+
+    mocker.patch.object(
+        drawing,
+        "draw_winners",
+        side_effect=psycopg.errors.QueryCanceled("canceling statement"),
+    )
+
+    assert jobs.run_next_draw_job(test_db_conn) is True
+    assert jobs.run_next_draw_job(test_db_conn) is False
+
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{sold_out_raffle['raffle_id']}/draw-job/")
+
+    assert response.json()["status"] == "failed"
+    assert response.json()["error"] == "canceling statement"
@@ -0,0 +1,56 @@
+import json
+import uuid
+
+import pytest
+
+
+@pytest.fixture()
+def drawn_raffle(client, raffle, override_ip, manager_ip) -> dict:
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffle['raffle_id']}/winners/")
+
+    return raffle
+
+
+def test_export_raffle_csv_response(client, drawn_raffle, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{drawn_raffle['raffle_id']}/export/")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [
+        "ticket_number,ip_address,prize",
+        "1,127.0.0.1,prize",
+    ]
+
+
+def test_export_raffle_ndjson_response(client, drawn_raffle, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        response = client.get(
+            f"/raffles/{drawn_raffle['raffle_id']}/export/",
+            params={"format": "ndjson"},
+        )
+
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"ticket_number": 1, "ip_address": "127.0.0.1", "prize": "prize"},
+    ]
+
+
+def test_export_raffle_unauthorized(client, raffle, override_ip):
+    with override_ip("127.0.0.1"):
+        response = client.get(f"/raffles/{raffle['raffle_id']}/export/")
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Unauthorized"
+
+
+def test_export_raffle_not_found(client, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{uuid.uuid4()}/export/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Raffle not found"
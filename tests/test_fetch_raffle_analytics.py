@@ -0,0 +1,72 @@
+import datetime
+import time
+import uuid
+
+
+def test_fetch_raffle_analytics_response(
+    client, raffle_factory, override_ip, manager_ip
+):
+    raffle = raffle_factory(total_tickets=2)
+
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{raffle['raffle_id']}/analytics/")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["raffle_id"] == raffle["raffle_id"]
+    assert data["sold_out_at"] is None
+    assert data["seconds_to_sell_out"] is None
+    assert data["fill_rate"] == 0.5
+    assert [rollup["claims"] for rollup in data["claims_per_minute"]] == [1]
+
+
+def test_fetch_raffle_analytics_sold_out(client, raffle, override_ip, manager_ip):
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{raffle['raffle_id']}/analytics/")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["sold_out_at"] is not None
+    assert data["seconds_to_sell_out"] >= 0
+    assert data["fill_rate"] == 1.0
+
+
+def test_fetch_raffle_analytics_sold_out_after_opening(
+    client, raffle_factory, override_ip, manager_ip
+):
+    opens_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        seconds=1
+    )
+    raffle = raffle_factory(opens_at=opens_at.isoformat())
+    time.sleep(1.1)
+
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{raffle['raffle_id']}/analytics/")
+
+    assert response.status_code == 200
+    assert 0 <= response.json()["seconds_to_sell_out"] < 1
+
+
+def test_fetch_raffle_analytics_unauthorized(client, raffle, override_ip):
+    with override_ip("127.0.0.1"):
+        response = client.get(f"/raffles/{raffle['raffle_id']}/analytics/")
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Unauthorized"
+
+
+def test_fetch_raffle_analytics_not_found(client, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        response = client.get(f"/raffles/{uuid.uuid4()}/analytics/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Raffle not found"
@@ -0,0 +1,23 @@
+def test_fetch_stats_counts_reads(client, raffle, override_ip, manager_ip):
+    with override_ip(manager_ip):
+        before = client.get("/stats/").json()
+
+    client.get(f"/raffles/{raffle['raffle_id']}/")
+    client.get(f"/raffles/{raffle['raffle_id']}/")
+
+    with override_ip(manager_ip):
+        response = client.get("/stats/")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "read_queries": before["read_queries"] + 2,
+        "coalesced_reads": before["coalesced_reads"],
+    }
+
+
+def test_fetch_stats_unauthorized(client, override_ip):
+    with override_ip("127.0.0.1"):
+        response = client.get("/stats/")
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Unauthorized"
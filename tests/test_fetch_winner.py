@@ -0,0 +1,41 @@
+import uuid
+
+
+def test_fetch_winner_success_response(client, raffle, override_ip, manager_ip):
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffle['raffle_id']}/winners/")
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/winners/1/")
+
+    assert response.status_code == 200
+    assert response.json() == {"ticket_number": 1, "prize": "prize"}
+
+
+def test_fetch_winner_raffle_not_found(client):
+    response = client.get(f"/raffles/{uuid.uuid4()}/winners/1/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Raffle not found"
+
+
+def test_fetch_winner_winners_not_drawn(client, raffle):
+    response = client.get(f"/raffles/{raffle['raffle_id']}/winners/1/")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Winners not drawn"
+
+
+def test_fetch_winner_not_found(client, raffle, override_ip, manager_ip):
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffle['raffle_id']}/winners/")
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/winners/2/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Winner not found"
@@ -0,0 +1,70 @@
+from raffle import compaction
+
+
+def test_list_tickets_response(client, raffle_factory, override_ip, manager_ip):
+    raffles = [raffle_factory(name=f"raffle {i}") for i in range(3)]
+
+    with override_ip("127.0.0.1"):
+        for raffle in raffles[:2]:
+            client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip("127.0.0.2"):
+        client.post(f"/raffles/{raffles[2]['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffles[0]['raffle_id']}/winners/")
+
+    with override_ip("127.0.0.1"):
+        response = client.get("/tickets/")
+
+    assert response.status_code == 200
+    assert "link" not in response.headers
+
+    tickets = {ticket["raffle_id"]: ticket for ticket in response.json()}
+    assert set(tickets) == {raffle["raffle_id"] for raffle in raffles[:2]}
+    assert tickets[raffles[0]["raffle_id"]]["prize"] == "prize"
+    assert tickets[raffles[1]["raffle_id"]]["prize"] is None
+    assert tickets[raffles[1]["raffle_id"]]["winners_drawn"] is False
+    assert all("verification_code" not in ticket for ticket in tickets.values())
+
+
+def test_list_tickets_archived(client, test_db_conn, raffle, override_ip, manager_ip):
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffle['raffle_id']}/winners/")
+
+    assert compaction.compact_raffles(test_db_conn) == 1
+
+    with override_ip("127.0.0.1"):
+        response = client.get("/tickets/")
+
+    assert [ticket["prize"] for ticket in response.json()] == ["prize"]
+
+
+def test_list_tickets_pagination(client, raffle_factory, override_ip):
+    raffles = [raffle_factory(name=f"raffle {i}") for i in range(5)]
+
+    with override_ip("127.0.0.1"):
+        for raffle in raffles:
+            client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+        raffle_ids = []
+        url = "/tickets/?limit=2"
+
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            raffle_ids.extend(ticket["raffle_id"] for ticket in response.json())
+            url = response.links.get("next", {}).get("url")
+
+    assert raffle_ids == sorted(raffle["raffle_id"] for raffle in raffles)
+
+
+def test_list_tickets_empty(client, raffle, override_ip):
+    with override_ip("127.0.0.1"):
+        response = client.get("/tickets/")
+
+    assert response.status_code == 200
+    assert response.json() == []
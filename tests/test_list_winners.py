@@ -24,3 +24,31 @@ def test_list_winners_raffle_winners_not_drawn(client, raffle):
     response = client.get(f"/raffles/{raffle['raffle_id']}/winners/")
 
     assert response.status_code == 400
+
+
+def test_list_winners_paginated(client, raffle_factory, override_ip, manager_ip):
+    raffle = raffle_factory(
+        total_tickets=3,
+        prizes=[{"name": "prize", "amount": 3}],
+    )
+
+    for ip_address in ["127.0.0.1", "127.0.0.2", "127.0.0.3"]:
+        with override_ip(ip_address):
+            client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffle['raffle_id']}/winners/")
+
+    response = client.get(
+        f"/raffles/{raffle['raffle_id']}/winners/",
+        params={"limit": 2},
+    )
+
+    assert response.status_code == 200
+    assert [winner["ticket_number"] for winner in response.json()] == [1, 2]
+
+    response = client.get(response.links["next"]["url"])
+
+    assert response.status_code == 200
+    assert [winner["ticket_number"] for winner in response.json()] == [3]
+    assert "next" not in response.links
@@ -0,0 +1,244 @@
+import datetime
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg.errors
+import pydantic
+import pytest
+
+from raffle import db, memory
+from raffle.config import load_settings
+
+
+@pytest.fixture()
+def memory_conn() -> memory.Connection:
+    return memory.Connection(memory.Store())
+
+
+def create_raffle(conn: memory.Connection, total_tickets: int) -> uuid.UUID:
+    raffle_id = uuid.uuid4()
+
+    with db.pipeline(conn):
+        db.queries.create_raffle(
+            conn,
+            raffle_id=raffle_id,
+            name="raffle",
+            total_tickets=total_tickets,
+            opens_at=None,
+            waiting_room=False,
+        )
+        db.queries.create_tickets(
+            conn, raffle_id=raffle_id, total_tickets=total_tickets
+        )
+        db.queries.create_prizes(
+            conn, [{"raffle_id": raffle_id, "name": "prize", "amount": 1}]
+        )
+
+    return raffle_id
+
+
+def claim(conn: memory.Connection, raffle_id: uuid.UUID, ip_address: str):
+    db.queries.claim_ticket(
+        conn,
+        raffle_id=raffle_id,
+        ticket_number=1,
+        ip_address=ip_address,
+        verification_code="ABCDEFGH",
+        crypt_algorithm="md5",
+    )
+
+
+def test_every_query_has_a_store_method():
+    names = {
+        name for name in db.queries.available_queries if not name.endswith("_cursor")
+    }
+
+    assert all(callable(getattr(memory.Store, name, None)) for name in names)
+
+
+def test_concurrent_claims_take_each_ticket_once(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=50)
+
+    def participate(player: int) -> int | None:
+        while True:
+            pool = list(
+                db.queries.fetch_ticket_pool(memory_conn, raffle_id=raffle_id, limit=5)
+            )
+
+            if not pool:
+                return None
+
+            ticket = random.choice(pool)
+
+            try:
+                with db.pipeline(memory_conn):
+                    db.queries.claim_ticket(
+                        memory_conn,
+                        raffle_id=raffle_id,
+                        ticket_number=ticket.ticket_number,
+                        ip_address=f"10.0.0.{player}",
+                        verification_code="ABCDEFGH",
+                        crypt_algorithm="md5",
+                    )
+                    db.queries.release_ticket(memory_conn, raffle_id=raffle_id)
+            except psycopg.errors.UniqueViolation:
+                continue
+
+            return ticket.ticket_number
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tickets = [ticket for ticket in executor.map(participate, range(100)) if ticket]
+
+    raffle = db.queries.fetch_raffle(memory_conn, raffle_id=raffle_id)
+
+    assert sorted(tickets) == list(range(1, 51))
+    assert raffle.available_tickets == 0
+
+
+def test_claim_ticket_once_per_ip_address(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=2)
+    claim(memory_conn, raffle_id, "127.0.0.1")
+
+    with pytest.raises(psycopg.errors.UniqueViolation):
+        db.queries.claim_ticket(
+            memory_conn,
+            raffle_id=raffle_id,
+            ticket_number=2,
+            ip_address="127.0.0.1",
+            verification_code="ABCDEFGH",
+            crypt_algorithm="md5",
+        )
+
+
+def test_release_ticket_stops_at_sold_out(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+    db.queries.release_ticket(memory_conn, raffle_id=raffle_id)
+
+    with pytest.raises(psycopg.errors.CheckViolation):
+        db.queries.release_ticket(memory_conn, raffle_id=raffle_id)
+
+    analytics = db.queries.fetch_raffle_analytics(memory_conn, raffle_id=raffle_id)
+
+    assert analytics.available_tickets == 0
+    assert analytics.sold_out_at is not None
+
+
+def test_close_raffle_only_once(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+
+    assert db.queries.close_raffle(memory_conn, raffle_id=raffle_id) == raffle_id
+    assert db.queries.close_raffle(memory_conn, raffle_id=raffle_id) is None
+
+
+def test_verification_code_is_hashed(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+    claim(memory_conn, raffle_id, "127.0.0.1")
+
+    valid, invalid = (
+        db.queries.fetch_ticket_with_validity(
+            memory_conn,
+            raffle_id=raffle_id,
+            ticket_number=1,
+            verification_code=code,
+        )
+        for code in ("ABCDEFGH", "HGFEDCBA")
+    )
+
+    assert valid.is_valid is True
+    assert invalid.is_valid is False
+
+
+def test_store_announces_updates(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=2)
+    updates = []
+    memory_conn.store.listeners.add(updates.append)
+
+    db.queries.release_ticket(memory_conn, raffle_id=raffle_id)
+    db.queries.release_ticket(memory_conn, raffle_id=raffle_id)
+    db.queries.close_raffle(memory_conn, raffle_id=raffle_id)
+
+    assert updates == [
+        {"raffle_id": str(raffle_id), "available_tickets": 0, "winners_drawn": False},
+        {"raffle_id": str(raffle_id), "available_tickets": 0, "winners_drawn": True},
+    ]
+
+
+def test_queue_admission_moves_on_while_open(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+
+    for number in range(1, 11):
+        db.queries.join_queue(
+            memory_conn, raffle_id=raffle_id, ip_address=f"10.0.0.{number}"
+        )
+
+    def admitted_position() -> int:
+        return db.queries.fetch_queue_entry(
+            memory_conn, raffle_id=raffle_id, ip_address="10.0.0.10", window=2
+        ).admitted_position
+
+    assert admitted_position() == 2
+
+    memory_conn.store.raffles[raffle_id].created_at -= datetime.timedelta(minutes=3)
+
+    assert admitted_position() == 8
+
+
+def test_store_update_survives_failing_listener(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+    memory_conn.store.listeners.add(lambda update: 1 / 0)
+
+    db.queries.release_ticket(memory_conn, raffle_id=raffle_id)
+
+    assert (
+        db.queries.fetch_raffle(memory_conn, raffle_id=raffle_id).available_tickets == 0
+    )
+
+
+def test_migrations_reset_store(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+
+    db.migrations.delete_schema(memory_conn)
+    db.migrations.create_schema(memory_conn)
+
+    assert db.queries.fetch_raffle(memory_conn, raffle_id=raffle_id) is None
+
+
+def test_settings_need_no_connection_for_memory(monkeypatch):
+    for variable in ("PGDATABASE", "PGHOST", "PGPASSWORD", "PGPORT", "PGUSER"):
+        monkeypatch.delenv(variable, raising=False)
+
+    settings = load_settings(_env_file=None, db_backend="memory")
+
+    assert settings.db_urls == ["memory://"]
+
+    with pytest.raises(pydantic.ValidationError, match="PGHOST"):
+        load_settings(_env_file=None, db_backend="postgres")
+
+
+def test_transactions_lock_only_their_raffle(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+    other_raffle_id = create_raffle(memory_conn, total_tickets=1)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with memory_conn.transaction():
+            claim(memory_conn, raffle_id, "10.0.0.1")
+            other = executor.submit(claim, memory_conn, other_raffle_id, "10.0.0.1")
+            blocked = executor.submit(claim, memory_conn, raffle_id, "10.0.0.2")
+
+            other.result(timeout=1)
+
+            with pytest.raises(TimeoutError):
+                blocked.result(timeout=0.1)
+
+        with pytest.raises(psycopg.errors.UniqueViolation):
+            blocked.result(timeout=1)
+
+
+def test_export_participants_yields_each_line(memory_conn):
+    raffle_id = create_raffle(memory_conn, total_tickets=1)
+    claim(memory_conn, raffle_id, "10.0.0.1")
+
+    lines = list(db.export_participants(memory_conn, raffle_id, "csv"))
+
+    assert lines == [b"ticket_number,ip_address,prize\n", b"1,10.0.0.1,\n"]
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from raffle import deps, profiling
+
+
+@pytest.fixture()
+def profile_dir(client, test_settings, tmp_path):
+    """Return a function to write profiles to a temporary directory."""
+
+    def inner(**update):
+        settings = test_settings.model_copy(update={"profile_dir": tmp_path, **update})
+        client.app.dependency_overrides[deps.get_settings] = lambda: settings
+        return tmp_path
+
+    return inner
+
+
+def test_stack_sampler_counts_busy_threads():
+    stopped = threading.Event()
+
+    def spin():
+        while not stopped.is_set():
+            pass
+
+    thread = threading.Thread(target=spin)
+    thread.start()
+
+    try:
+        with profiling.StackSampler(0.001) as sampler:
+            for _ in range(10):
+                sampler.sample()
+    finally:
+        stopped.set()
+        thread.join()
+
+    assert any("spin (test_profiling.py" in stack for stack in sampler.wall)
+    assert set(sampler.cpu) <= set(sampler.wall)
+
+
+def test_profile_header_writes_profile(
+    client, raffle, profile_dir, override_ip, manager_ip
+):
+    profile_dir = profile_dir()
+
+    with override_ip(manager_ip):
+        response = client.get(
+            f"/raffles/{raffle['raffle_id']}/",
+            headers={"X-Profile": "1"},
+        )
+
+    assert response.status_code == 200
+    assert sorted(path.name.split("-", 1)[1] for path in profile_dir.iterdir()) == [
+        f"fetch_raffle-{raffle['raffle_id']}.cpu.folded",
+        f"fetch_raffle-{raffle['raffle_id']}.wall.folded",
+    ]
+
+
+def test_profile_header_requires_manager(client, raffle, profile_dir):
+    profile_dir = profile_dir()
+
+    response = client.get(
+        f"/raffles/{raffle['raffle_id']}/",
+        headers={"X-Profile": "1"},
+    )
+
+    assert response.status_code == 200
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_profile_sample_rate(client, raffle, profile_dir):
+    profile_dir = profile_dir(profile_sample_rate=1.0)
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/")
+
+    assert response.status_code == 200
+    assert len(list(profile_dir.iterdir())) == 2
+
+
+def test_profile_not_sampled_by_default(client, raffle, profile_dir):
+    profile_dir = profile_dir()
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/")
+
+    assert response.status_code == 200
+    assert list(profile_dir.iterdir()) == []
@@ -0,0 +1,77 @@
+import pytest
+
+from raffle import seeding
+
+# Raffles are seeded with copy, which only Postgres supports
+pytestmark = pytest.mark.postgres
+
+
+def seed(conn, **kwargs) -> int:
+    return seeding.seed_raffles(
+        [conn],
+        raffles=20,
+        min_tickets=5,
+        max_tickets=50,
+        players=100,
+        **kwargs,
+    )
+
+
+def test_seed_raffles_consistent_counts(reset_db, test_db_conn):
+    assert seed(test_db_conn) == 20
+
+    raffles = test_db_conn.execute(
+        """
+        select
+          raffle_id,
+          total_tickets,
+          available_tickets,
+          sold_out_at,
+          winners_drawn,
+          (select count(*) from tickets t where t.raffle_id = r.raffle_id) as tickets,
+          (select count(*) from participants p where p.raffle_id = r.raffle_id)
+            as participants,
+          (select count(*) from winners w where w.raffle_id = r.raffle_id) as winners,
+          (select sum(amount) from prizes z where z.raffle_id = r.raffle_id) as prizes,
+          (select sum(claims) from claim_rollups c where c.raffle_id = r.raffle_id)
+            as claims
+        from
+          raffles r
+        """
+    ).fetchall()
+
+    assert len(raffles) == 20
+
+    for raffle in raffles:
+        claimed = raffle.total_tickets - raffle.available_tickets
+        assert raffle.tickets == raffle.total_tickets
+        assert raffle.participants == claimed
+        assert (raffle.claims or 0) == claimed
+        assert (raffle.sold_out_at is not None) == (raffle.available_tickets == 0)
+        assert raffle.winners == (raffle.prizes if raffle.winners_drawn else 0)
+
+
+def test_seed_raffles_deterministic(reset_db, test_db_conn):
+    seed(test_db_conn, seed=1)
+    first = test_db_conn.execute(
+        "select raffle_id from raffles order by raffle_id"
+    ).fetchall()
+
+    test_db_conn.execute("truncate raffles cascade")
+    seed(test_db_conn, seed=1)
+    second = test_db_conn.execute(
+        "select raffle_id from raffles order by raffle_id"
+    ).fetchall()
+
+    assert first == second
+
+
+def test_seeded_raffles_can_be_claimed(client, test_db_conn):
+    seed(test_db_conn, sold_out_ratio=0, drawn_ratio=0)
+    raffle_id = test_db_conn.execute(
+        "select raffle_id from raffles where available_tickets > 0 limit 1"
+    ).fetchone()[0]
+
+    response = client.post(f"/raffles/{raffle_id}/participate/")
+
+    assert response.status_code == 200
@@ -0,0 +1,80 @@
+import uuid
+
+import psycopg
+import pytest
+
+from raffle import db, deps
+
+SHARDS = ("test_shard_0", "test_shard_1")
+
+
+@pytest.fixture(scope="session")
+def shard_dbs(settings):
+    """Create a test database for each shard if they do not already exist."""
+    if settings.db_backend == "memory":
+        return
+
+    with db.create_connection(settings) as conn:
+        for shard in SHARDS:
+            try:
+                conn.execute(f"create database {shard};")
+            except psycopg.errors.DuplicateDatabase:
+                pass
+
+
+@pytest.fixture()
+def sharded_settings(shard_dbs, test_settings):
+    """Spread raffles across the shard databases and reset each of them."""
+    server_url = test_settings.db_url.rsplit("/", 1)[0]
+    sharded_settings = test_settings.model_copy(
+        update={"db_shard_urls": [f"{server_url}/{shard}" for shard in SHARDS]}
+    )
+
+    for shard in range(len(SHARDS)):
+        with db.create_connection(sharded_settings, shard) as conn:
+            db.migrations.delete_schema(conn)
+            db.migrations.create_schema(conn)
+
+    return sharded_settings
+
+
+@pytest.fixture()
+def sharded_client(client, sharded_settings):
+    client.app.dependency_overrides[deps.get_settings] = lambda: sharded_settings
+    return client
+
+
+def test_create_raffle_on_shard(sharded_client, sharded_settings, raffle_factory):
+    raffles = [raffle_factory(name=f"raffle {i}") for i in range(8)]
+
+    for raffle in raffles:
+        raffle_id = raffle["raffle_id"]
+        expected = db.shard_index(uuid.UUID(raffle_id), len(SHARDS))
+
+        for shard in range(len(SHARDS)):
+            with db.create_connection(sharded_settings, shard) as conn:
+                found = db.queries.fetch_raffle(conn, raffle_id=raffle_id)
+
+            assert (found is not None) == (shard == expected)
+
+
+def test_list_raffles_merges_shards(sharded_client, raffle_factory):
+    raffles = [raffle_factory(name=f"raffle {i}") for i in range(12)]
+
+    response = sharded_client.get("/raffles/")
+
+    assert response.status_code == 200
+    assert [raffle["raffle_id"] for raffle in response.json()] == [
+        raffle["raffle_id"] for raffle in reversed(raffles[-10:])
+    ]
+
+
+def test_claim_ticket_on_shard(sharded_client, raffle, override_ip):
+    with override_ip("127.0.0.1"):
+        response = sharded_client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    assert response.status_code == 200
+
+    response = sharded_client.get(f"/raffles/{raffle['raffle_id']}/")
+
+    assert response.json()["available_tickets"] == 0
@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+
+import pytest
+
+from raffle import db, deps, memory
+from raffle.events import RaffleEvents
+
+
+def test_stream_raffle_events_winners_drawn(client, raffle, override_ip, manager_ip):
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip(manager_ip):
+        client.post(f"/raffles/{raffle['raffle_id']}/winners/")
+
+    response = client.get(f"/raffles/{raffle['raffle_id']}/events/")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == (
+        'event: tickets\ndata: {"available_tickets": 0}\n\n'
+        "event: winners\ndata: {}\n\n"
+    )
+
+
+def test_stream_raffle_events_not_found(client):
+    response = client.get(f"/raffles/{uuid.uuid4()}/events/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Raffle not found"
+
+
+@pytest.mark.postgres
+def test_stream_raffle_events_saturated_pool(client, raffle, test_settings):
+    settings = test_settings.model_copy(
+        update={
+            "db_pool_size": 1,
+            "endpoint_timeouts": {"stream_raffle_events": 0.1},
+        }
+    )
+    client.app.dependency_overrides[deps.get_settings] = lambda: settings
+    (pool,) = deps.get_bulkhead_pools(settings, "default")
+
+    with pool.connection():
+        response = client.get(f"/raffles/{raffle['raffle_id']}/events/")
+
+    assert response.status_code == 503
+
+
+def test_raffle_events_keeps_latest_update(mocker):
+    events = RaffleEvents("postgresql://", interval=1.0)
+    mocker.patch.object(events, "_listen")
+    raffle_id = uuid.uuid4()
+
+    async def run():
+        updates = events.subscribe(raffle_id)
+        other_updates = events.subscribe(uuid.uuid4())
+        await asyncio.sleep(0)
+
+        events.publish({"raffle_id": str(raffle_id), "available_tickets": 2})
+        events.publish({"raffle_id": str(raffle_id), "available_tickets": 1})
+
+        assert updates.get_nowait()["available_tickets"] == 1
+        assert other_updates.empty()
+
+        events.unsubscribe(raffle_id, updates)
+
+    asyncio.run(run())
+
+
+def test_raffle_events_ready_once_following_store():
+    store = memory.Store()
+    conn = memory.Connection(store)
+    raffle_id = uuid.uuid4()
+    db.queries.create_raffle(
+        conn,
+        raffle_id=raffle_id,
+        name="raffle",
+        total_tickets=1,
+        opens_at=None,
+        waiting_room=False,
+    )
+    events = RaffleEvents("memory://", interval=1.0, store=store)
+
+    async def run():
+        updates = events.subscribe(raffle_id)
+        await asyncio.wait_for(events.ready(), timeout=1)
+
+        db.queries.close_raffle(conn, raffle_id=raffle_id)
+
+        update = await asyncio.wait_for(updates.get(), timeout=1)
+        events.unsubscribe(raffle_id, updates)
+
+        return update
+
+    assert asyncio.run(run())["winners_drawn"] is True
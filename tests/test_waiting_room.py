@@ -0,0 +1,143 @@
+import uuid
+
+import pytest
+
+from raffle import db, deps
+
+
+@pytest.fixture()
+def queued_raffle(client, test_settings, raffle_factory) -> dict:
+    settings = test_settings.model_copy(update={"waiting_room_window": 1})
+    client.app.dependency_overrides[deps.get_settings] = lambda: settings
+    return raffle_factory(total_tickets=5, waiting_room=True)
+
+
+def test_join_queue_success_response(client, override_ip, queued_raffle):
+    assert queued_raffle["waiting_room"] is True
+
+    for number in range(1, 4):
+        with override_ip(f"127.0.0.{number}"):
+            response = client.post(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+
+        assert response.status_code == 200
+        assert response.json()["position"] == number
+
+    with override_ip("127.0.0.3"):
+        response = client.get(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+
+    assert response.status_code == 200
+    assert response.json() == {"position": 3, "ahead": 2, "admitted": False}
+
+
+def test_join_queue_twice_keeps_position(client, override_ip, queued_raffle):
+    with override_ip("127.0.0.1"):
+        first = client.post(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+        second = client.post(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+
+    with override_ip("127.0.0.2"):
+        third = client.post(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+
+    assert first.json() == second.json()
+    assert third.json()["position"] == 2
+
+
+def test_join_queue_does_not_exist(client, override_ip):
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{uuid.uuid4()}/queue/")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Raffle not found"
+
+
+def test_join_queue_no_waiting_room(client, override_ip, raffle):
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/queue/")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No waiting room"
+
+
+def test_fetch_queue_entry_not_in_queue(client, override_ip, queued_raffle):
+    with override_ip("127.0.0.1"):
+        response = client.get(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Not in queue"
+
+
+def test_claim_ticket_requires_queue(client, override_ip, queued_raffle):
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{queued_raffle['raffle_id']}/participate/")
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Not in queue"
+
+
+def test_claim_ticket_admits_in_order(client, override_ip, queued_raffle):
+    raffle_id = queued_raffle["raffle_id"]
+
+    for number in range(1, 3):
+        with override_ip(f"127.0.0.{number}"):
+            client.post(f"/raffles/{raffle_id}/queue/")
+
+    with override_ip("127.0.0.2"):
+        response = client.post(f"/raffles/{raffle_id}/participate/")
+
+    assert response.status_code == 429
+    assert response.json()["detail"] == "Not admitted yet"
+
+    with override_ip("127.0.0.1"):
+        response = client.post(f"/raffles/{raffle_id}/participate/")
+
+    assert response.status_code == 200
+
+    with override_ip("127.0.0.2"):
+        assert client.get(f"/raffles/{raffle_id}/queue/").json()["admitted"] is True
+        response = client.post(f"/raffles/{raffle_id}/participate/")
+
+    assert response.status_code == 200
+
+
+def test_join_queue_sold_out_skips_database(
+    client, override_ip, raffle_factory, mocker
+):
+    raffle = raffle_factory(total_tickets=1, waiting_room=True)
+
+    with override_ip("127.0.0.1"):
+        client.post(f"/raffles/{raffle['raffle_id']}/queue/")
+        client.post(f"/raffles/{raffle['raffle_id']}/participate/")
+
+    with override_ip("127.0.0.2"):
+        response = client.post(f"/raffles/{raffle['raffle_id']}/queue/")
+
+    assert response.status_code == 410
+
+    fetch_raffle = mocker.spy(db.queries, "fetch_raffle")
+
+    with override_ip("127.0.0.3"):
+        response = client.get(f"/raffles/{raffle['raffle_id']}/queue/")
+
+    assert response.status_code == 410
+    assert response.json()["detail"] == "No tickets remaining"
+    assert fetch_raffle.call_count == 0
+
+
+@pytest.mark.postgres
+def test_fetch_queue_entry_admits_more_while_open(
+    client, override_ip, queued_raffle, test_db_conn
+):
+    for number in range(1, 4):
+        with override_ip(f"127.0.0.{number}"):
+            client.post(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+
+    test_db_conn.execute(
+        "update raffles set created_at = created_at - interval '2 minutes'"
+        " where raffle_id = %s",
+        [queued_raffle["raffle_id"]],
+    )
+
+    with override_ip("127.0.0.3"):
+        response = client.get(f"/raffles/{queued_raffle['raffle_id']}/queue/")
+
+    assert response.status_code == 200
+    assert response.json() == {"position": 3, "ahead": 0, "admitted": True}
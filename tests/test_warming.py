@@ -0,0 +1,19 @@
+import datetime
+
+from raffle import deps, warming
+
+
+def test_warm_opening_raffles(client, raffle_factory, test_settings):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    opening = raffle_factory(
+        total_tickets=10, opens_at=(now + datetime.timedelta(seconds=30)).isoformat()
+    )
+    raffle_factory(opens_at=(now + datetime.timedelta(hours=2)).isoformat())
+    raffle_factory(opens_at=(now - datetime.timedelta(seconds=30)).isoformat())
+    raffle_factory()
+
+    (pool,) = deps.get_bulkhead_pools(test_settings, "claims")
+
+    assert [str(raffle_id) for raffle_id in warming.warm_opening_raffles(pool, 60)] == [
+        opening["raffle_id"]
+    ]